@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+
+import argparse
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+import uuid
+
+import prettytable
+
+from usage import disk_usage_command, USAGE_BACKENDS
+
+MIB = 1024 * 1024
+
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser(
+        description='Benchmarking the disk usage probe backends on a synthetic instances directory',
+        usage="bench_probe.py [-n INSTANCES] [-f FILES] [-s SIZE] [-r REPEAT]",
+    )
+    parser.add_argument('-n', '--instances',
+                        help='Number of instance directories to create',
+                        action='store',
+                        type=int,
+                        default=200,
+                        dest='instances')
+    parser.add_argument('-f', '--files',
+                        help='Number of small files in each instance directory besides the disk',
+                        action='store',
+                        type=int,
+                        default=3,
+                        dest='files')
+    parser.add_argument('-s', '--size',
+                        help='MiB written to each sparse 40G instance disk',
+                        action='store',
+                        type=int,
+                        default=4,
+                        dest='size')
+    parser.add_argument('-r', '--repeat',
+                        help='Number of runs of each backend',
+                        action='store',
+                        type=int,
+                        default=5,
+                        dest='repeat')
+    parser.add_argument('-d', '--dir',
+                        help='Directory to create the instances directory in, a temporary one by default',
+                        action='store',
+                        dest='dir')
+
+    return parser.parse_args(args)
+
+
+def create_instances(instances_dir, instances, files, size):
+    # Directories the probe has to skip, like on a real hypervisor
+    for name in ['_base', 'locks', 'snapshots']:
+        os.makedirs(os.path.join(instances_dir, name))
+    with open(os.path.join(instances_dir, '_base', 'image'), 'wb') as f:
+        f.write(b'x' * size * MIB)
+
+    for _ in range(instances):
+        instance_dir = os.path.join(instances_dir, str(uuid.uuid4()))
+        os.makedirs(instance_dir)
+        # Sparse disk with only part of it allocated, the way qcow2 and raw disks usually are
+        with open(os.path.join(instance_dir, 'disk'), 'wb') as f:
+            f.write(b'x' * size * MIB)
+            f.truncate(40 * 1024 * MIB)
+        for i in range(files):
+            with open(os.path.join(instance_dir, f"file{i}"), 'wb') as f:
+                f.write(b'x' * 4096 * (i + 1))
+
+
+def run_backend(backend, instances_dir, repeat):
+    command = disk_usage_command(backend, [instances_dir])
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = subprocess.run(command, shell=True, check=True, capture_output=True, text=True).stdout
+        timings.append(time.perf_counter() - start)
+
+    # The last output as a dictionary of VM UUID and KiB
+    usage = {}
+    for line in output.splitlines():
+        fields = line.split(' ')
+        if len(fields) == 2:
+            usage[fields[0]] = int(fields[1])
+    return timings, usage
+
+
+def run(**kwargs):
+    base_dir = kwargs['dir'] or tempfile.mkdtemp(prefix='bench_probe')
+    # The probe commands cut the VM UUID after "instances/"
+    instances_dir = os.path.join(base_dir, 'instances')
+
+    try:
+        create_instances(instances_dir, kwargs['instances'], kwargs['files'], kwargs['size'])
+
+        headers = ['Backend', 'Instances', 'Total GiB', 'Min s', 'Avg s']
+        table = prettytable.PrettyTable()
+        table.field_names = headers
+        results = {}
+        for backend in USAGE_BACKENDS:
+            timings, usage = run_backend(backend, instances_dir, kwargs['repeat'])
+            results[backend] = usage
+            table.add_row([backend, len(usage), round(sum(usage.values()) / MIB, 2),
+                           round(min(timings), 4), round(sum(timings) / len(timings), 4)])
+        print(table)
+
+        # The backends should agree up to the size of the directory entries
+        du_usage = results['du']
+        for backend, usage in results.items():
+            if set(usage) != set(du_usage):
+                print(f"{backend}: {len(set(usage) ^ set(du_usage))} instances differ from du")
+            else:
+                max_diff = max([abs(usage[vm] - du_usage[vm]) for vm in usage] or [0])
+                print(f"{backend}: largest difference from du is {max_diff} KiB")
+    finally:
+        if not kwargs['dir']:
+            shutil.rmtree(base_dir, True)
+
+
+def main():
+    args = parse_args()
+
+    run(instances=args.instances, files=args.files, size=args.size, repeat=args.repeat, dir=args.dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+
+from contextlib import closing
+import json
+import os
+import sqlite3
+import time
+
+# Default location of the local cache, following the XDG cache directory convention
+CACHE_DIR = os.path.join(os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache')), 'collector')
+# Seconds to wait for another thread or process writing to the cache
+LOCK_TIMEOUT = 60
+
+
+class CachedResource(dict):
+    """Resource restored from the cache.
+
+    Allows both attribute and key access, the same way the resources
+    returned by the OpenStack SDK do.
+    """
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+
+def _to_dicts(resources):
+    dicts = []
+    # Attributes whose API name differs from the SDK name, per resource type
+    aliases = {}
+    for resource in resources:
+        if not hasattr(resource, 'to_dict'):
+            dicts.append(dict(resource))
+            continue
+        resource_type = type(resource)
+        if resource_type not in aliases:
+            aliases[resource_type] = [(attr, component.name) for attr, component
+                                      in resource_type._attributes_iterator() if component.name != attr]
+        data = resource.to_dict()
+        # Keeping the API names as well so keys like 'OS-EXT-AZ:availability_zone' still work
+        for attr, name in aliases[resource_type]:
+            # An API name can also be the SDK name of another attribute, e.g. config_drive
+            if attr in data and name not in data:
+                data[name] = data[attr]
+        dicts.append(data)
+    return dicts
+
+
+class SQLiteCache:
+    """Base class of the caches stored in a local SQLite database."""
+
+    filename = None
+    schema = None
+    # Bumped whenever the schema changes. The tables of a database with another
+    # version only hold cached data, so they are dropped instead of migrated
+    version = 0
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(CACHE_DIR, self.filename)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self._connect() as conn, conn:
+            if conn.execute('PRAGMA user_version').fetchone()[0] != self.version:
+                tables = conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall()
+                for (table,) in tables:
+                    conn.execute(f'DROP TABLE IF EXISTS "{table}"')
+                conn.execute(f'PRAGMA user_version = {self.version}')
+            conn.execute(self.schema)
+
+    def _connect(self):
+        return closing(sqlite3.connect(self.path, timeout=LOCK_TIMEOUT))
+
+
+class ListingCache(SQLiteCache):
+    """SQLite cache of OpenStack listings, keyed by cloud and listing name."""
+
+    filename = 'listings.sqlite'
+    schema = ('CREATE TABLE IF NOT EXISTS listings ('
+              'cloud TEXT, name TEXT, fetched_at REAL, data TEXT, '
+              'PRIMARY KEY (cloud, name))')
+
+    def get(self, cloud, name, max_age):
+        with self._connect() as conn:
+            row = conn.execute('SELECT fetched_at, data FROM listings WHERE cloud = ? AND name = ?',
+                               (cloud, name)).fetchone()
+        # Only snapshots younger than max_age seconds can be reused
+        if row is None or time.time() - row[0] > max_age:
+            return None
+        return json.loads(row[1], object_hook=CachedResource)
+
+    def put(self, cloud, name, resources):
+        data = json.dumps(_to_dicts(resources), default=str)
+        with self._connect() as conn, conn:
+            conn.execute('INSERT OR REPLACE INTO listings VALUES (?, ?, ?, ?)',
+                         (cloud, name, time.time(), data))
+
+
+class DiskUsageCache(SQLiteCache):
+    """SQLite cache of the VM disk usage probed on each hypervisor.
+
+    Every hypervisor row keeps the probe timestamp and the VMs the server
+    listing placed on it at that time, so a row is only reused while it is
+    young enough and the hypervisor still hosts exactly the same VMs.
+    The usage of each VM is stored in bytes. Rows are kept per usage
+    backend, since du and stat do not measure exactly the same.
+    """
+
+    filename = 'disk_usage.sqlite'
+    version = 2
+    schema = ('CREATE TABLE IF NOT EXISTS vm_disk_usage ('
+              'cloud TEXT, hypervisor TEXT, backend TEXT, probed_at REAL, vms TEXT, usage TEXT, '
+              'PRIMARY KEY (cloud, hypervisor, backend))')
+
+    def get(self, cloud, hypervisor, backend, max_age, vm_ids):
+        with self._connect() as conn:
+            row = conn.execute('SELECT probed_at, vms, usage FROM vm_disk_usage '
+                               'WHERE cloud = ? AND hypervisor = ? AND backend = ?',
+                               (cloud, hypervisor, backend)).fetchone()
+        if row is None or time.time() - row[0] > max_age:
+            return None
+        # VMs were created, deleted or moved since the last probe
+        if set(json.loads(row[1])) != set(vm_ids):
+            return None
+        return json.loads(row[2])
+
+    def put(self, cloud, hypervisor, backend, vm_ids, usage):
+        with self._connect() as conn, conn:
+            conn.execute('INSERT OR REPLACE INTO vm_disk_usage VALUES (?, ?, ?, ?, ?, ?)',
+                         (cloud, hypervisor, backend, time.time(), json.dumps(sorted(vm_ids)), json.dumps(usage)))
@@ -12,10 +12,12 @@ import openstack
 import openstack.config
 import os
 import prettytable
-from requests.exceptions import JSONDecodeError
 import sys
-from time import sleep
-from usage import high_risk_hv, vm_disk_usage
+from inventory import Inventory
+from cache import DiskUsageCache, ListingCache
+from indexes import PortIndex, SubnetIndex, project_meta
+from migration import MigrationClassifier
+from usage import DEFAULT_FORKS, DEFAULT_USAGE_BACKEND, PRECHECK_TIMEOUT, USAGE_BACKENDS
 
 # Getting the configuration data from clouds.yaml file
 config = openstack.config.loader.OpenStackConfig()
@@ -26,6 +28,17 @@ clouds = [
     'sin_private'
 ]
 
+# Mapping of each cloud to the cloud its VMs are migrated to
+migration_clouds = {
+    'iad_private': 'iad_osng',
+    'phx_private': 'phx_osng',
+    'sin_private': 'sin_osng',
+    'phx_understage': 'phx_nxt_2'
+}
+
+# Bytes per GB of flavor disk, the probed VM disk usage is in bytes
+GIB = 1024 ** 3
+
 
 class Table:
     def __init__(self, headers, data_list):
@@ -42,14 +55,19 @@ class Table:
 
 
 class Collector:
-    def __init__(self):
+    def __init__(self, inventory=None):
         self.client = {}
+        # Listings are shared between all collectors created with the same inventory
+        self.inventory = inventory if inventory is not None else Inventory()
 
     def _get_client(self, env):
-        cli = openstack.connect(cloud=env)
+        cli = self.inventory[env].client
         self._store_client(cli)
         return cli
 
+    def _get_inventory(self, env):
+        return self.inventory[env]
+
     def _store_client(self, client):
         self.client = client
 
@@ -63,8 +81,7 @@ class Collector:
 
 class HypervisorCollector(Collector):
     @staticmethod
-    def get_hypervisors_data(cli):
-        hypervisors = cli.list_hypervisors()
+    def get_hypervisors_data(hypervisors):
         hypervisors_data = []
         return print(hypervisors[0])
         for hypervisor in hypervisors:
@@ -116,8 +133,8 @@ class HypervisorCollector(Collector):
         return f"{round(total_free/1024, 2)} TB"
 
     def get_resources(self, env, json_output):
-        cli = self._get_client(env)
-        hypervisors_data = self.get_hypervisors_data(cli)
+        inventory = self._get_inventory(env)
+        hypervisors_data = self.get_hypervisors_data(inventory.hypervisors())
         if json_output:
             hv_data = self.format_hypervisors_data_as_json(hypervisors_data)
             return {env: sorted(hv_data, key=lambda x: int(x['use_percentage']), reverse=True)}
@@ -129,8 +146,8 @@ class HypervisorCollector(Collector):
 
 class EmptyHypervisorCollector(Collector):
     def get_resources(self, env, json_output):
-        cli = self._get_client(env)
-        hypervisors = cli.list_hypervisors()
+        inventory = self._get_inventory(env)
+        hypervisors = inventory.hypervisors()
         empty_hypervisors = []
         for hypervisor in hypervisors:
             if hypervisor.running_vms == 0:
@@ -151,33 +168,25 @@ class EmptyHypervisorCollector(Collector):
 
 class MigratedOHVMSCollector(Collector):
     def get_resources(self, env):
-        cli = self._get_client(env)
-        servers = cli.list_servers(
-            all_projects=True, bare=True, filters={'limit': 1000})
-        hypervisors = cli.list_hypervisors()
-
-        total_migrated_vms = [
-            vm for vm in servers if "oh_migration_state" in vm.metadata]
-
-        vms_count = {hypervisor.name: 0 for hypervisor in hypervisors}
-        for server in servers:
-            hypervisor_name = getattr(server, 'hypervisor_hostname', None)
-            if hypervisor_name:
-                vms_count[server.hypervisor_hostname] += 1
+        inventory = self._get_inventory(env)
+        # Fetching all the listings this report needs at the same time
+        inventory.prefetch('servers', 'hypervisors')
+        hypervisors = inventory.hypervisors()
+        # Servers and migrated servers counted per hypervisor in a single pass
+        hypervisor_index = inventory.hypervisor_index()
 
         empty_hvs = []
         fully_migrated_hvs = []
         for hypervisor in hypervisors:
-            total_vms = vms_count.get(hypervisor.name, 0)
-            migrated_vms = [vm for vm in servers if vm.hypervisor_hostname == hypervisor.name and "oh_migration_state" in vm.metadata]
+            total_vms = hypervisor_index.total(hypervisor.name)
 
             if total_vms == 0:
                 empty_hvs.append(hypervisor.name)
-            if total_vms != 0 and total_vms == len(migrated_vms):
+            if total_vms != 0 and total_vms == hypervisor_index.migrated(hypervisor.name):
                 fully_migrated_hvs.append(hypervisor.name)
 
         print('------------------------------------')
-        print(f"Number of migrated VMs: {len(total_migrated_vms)}")
+        print(f"Number of migrated VMs: {hypervisor_index.total_migrated()}")
         print(f"Number of empty HVs: {len(empty_hvs)}")
         print(f"Number of fully migrated HVs: {len(fully_migrated_hvs)}")
         print('------------------------------------')
@@ -222,35 +231,40 @@ class MigratedOHVMSCollector(Collector):
 
 class ServerCollector(Collector):
     def get_resources(self, env, sorter,  hours, disk):
-        cli = self._get_client(env)
+        inventory = self._get_inventory(env)
+        # Fetching all the listings this report needs at the same time
+        inventory.prefetch('servers', 'flavors', 'hypervisors')
         # Getting all servers
-        servers = cli.list_servers(
-            all_projects=True, bare=True, filters={'limit': 1000})
-        # Getting all flavors
-        flavors = cli.list_flavors()
+        servers = inventory.servers()
+        # Getting the flavors keyed by ID and name
+        flavors = inventory.flavor_index()
         # Setting the result table headings
         headers = ["Instance name", "State", "Created at",
                    'Flavor', "Allocated Disk", 'Used disk', 'Use %', "RAM", "VCPUs"]
         # Filling the table rows only with the needed columns
         servers_data = []
-        hypervisors = cli.list_hypervisors()
-        # Creating a list of Hypervisor hostnames
-        hypervisors_list = [h.name for h in hypervisors]
-        # Getting a dictionary containing all VMs and their real disk usage
-        vm_disk_usage_list = vm_disk_usage(hypervisors_list)
+        # Filtering instance by disk size before probing, so only the remaining VMs are sized
+        servers_flavors = []
         for server in servers:
-            flavor_id = server.flavor.id
             # Getting the server flavor
-            srv_flavor = [f for f in flavors if f.id ==
-                          flavor_id or f.name == flavor_id][0]
-            real_usage = vm_disk_usage_list.get(server.id)
-            real_usage = format_disk_usage(real_usage)
-            usage_percentage = round((real_usage / srv_flavor.disk) * 100, 2)
+            srv_flavor = flavors.get(server)
+            if int(srv_flavor.disk) >= int(disk):
+                servers_flavors.append((server, srv_flavor))
+        if int(disk) > 0:
+            # Getting a dictionary containing the real disk usage of the filtered VMs
+            vm_disk_usage_list = inventory.vm_disk_usage(vm_ids=[server.id for server, _ in servers_flavors])
+        else:
+            hypervisors = inventory.hypervisors()
+            # Creating a list of Hypervisor hostnames
+            hypervisors_list = [h.name for h in hypervisors]
+            # Getting a dictionary containing all VMs and their real disk usage
+            vm_disk_usage_list = inventory.vm_disk_usage(hypervisors_list)
+        for server, srv_flavor in servers_flavors:
+            real_usage = vm_disk_usage_list.get(server.id, 0)
+            usage_percentage = disk_use_percentage(real_usage, srv_flavor.disk, 2)
             servers_data.append([server.name, server.status, server.created_at, srv_flavor.name,
-                                srv_flavor.disk, real_usage, usage_percentage,  srv_flavor.ram, srv_flavor.vcpus])
+                                srv_flavor.disk, round(real_usage / GIB, 2), usage_percentage,  srv_flavor.ram, srv_flavor.vcpus])
 
-        # Filtering instance by disk size
-        servers_data = [x for x in servers_data if int(x[4]) >= int(disk)]
         self.print_general_info(servers_data, env, hours)
         servers_data = self.switch(sorter, servers_data)
         table = Table(headers, servers_data)
@@ -334,16 +348,16 @@ class ServerCollector(Collector):
 
 class HighRiskCollector(Collector):
     def get_resources(self, env, json_output):
-        cli = self._get_client(env)
+        inventory = self._get_inventory(env)
 
         # Getting a full list of hypervisors
-        hypervisors = cli.list_hypervisors()
+        hypervisors = inventory.hypervisors()
 
         # Creating a list of hypervisors hostnames
         hypervisors_hostnames = [h.name for h in hypervisors]
 
         # Running an ansible playbook to check disk, ram usage and raid puncture errors
-        hv_data = high_risk_hv(hypervisors_hostnames)
+        hv_data = inventory.hypervisors_health(hypervisors_hostnames)
 
         # Creating a list to check if the disk or ram usage is above 90% or if any raid puncture errors present
         high_risk_hypervisors = {}
@@ -387,56 +401,36 @@ class HighRiskCollector(Collector):
 
 class ZoneCollector(Collector):
     def get_resources(self, env, json_output):
-        cli = self._get_client(env)
+        inventory = self._get_inventory(env)
+        dest_env = migration_clouds[env]
+        # Fetching the source listings and the destination servers at the same time
+        self.inventory.prefetch({env: ['subnets', 'servers', 'projects'], dest_env: ['servers']})
 
         # Getting a list of all subnets
-        subnets = cli.list_subnets()
+        subnets = inventory.subnets()
         # Getting a list of all servers
-        servers = cli.list_servers(
-            all_projects=True, bare=True, filters={'limit': 1000})
+        servers = inventory.servers()
         active_servers = [s for s in servers if s.status == 'ACTIVE']
 
-        # Getting a list of all projects
-        projects = cli.list_projects()
+        # Getting the projects indexed by ID
+        project_index = inventory.project_index()
 
-        # Filtering only the projects that don't have the migrate_to metadata
-        projects_with_no_migrate_meta = [
-            p.id for p in projects if 'migrate_to' not in p.meta]
+        # Getting destination VMs that contain migration metadata
+        dest_servers_with_migration_meta = self._get_inventory(
+            dest_env).migration_targets()
 
-        # Filtering projects that have "do_not_migrate" tag
-        do_not_migrate_projects = [p.id for p in projects if p.meta.get(
-            'migrate_to') == "do_not_migrate"]
+        classifier = MigrationClassifier(
+            project_index, dest_servers_with_migration_meta)
 
-        # Servers mapping:
-        server_map = {
-            'iad_private': 'iad_osng',
-            'phx_private': 'phx_osng',
-            'sin_private': 'sin_osng'
-        }
-
-        # Getting destination cloud data
-        dest_cli = self._get_client(server_map[env])
-        dest_servers = dest_cli.list_servers(
-            all_projects=True, bare=True, filters={'limit': 1000})
-
-        # Filtering destination VMs that contain migration metadata
-        dest_servers_with_migration_meta = [
-            s for s in dest_servers if "migration_src" in s.metadata.keys()]
-
-        needed_servers = []
         # Filtering the subnets to get only the once that are not floating
         needed_subnets = [s for s in subnets if 'floating' not in s.name]
 
-        # Filtering the VMs that contain migration metadata
-        for server in servers:
-            if "migration_dst" in server.metadata.keys():
-                if not any(s.id == server.metadata['migration_dst'] for s in dest_servers_with_migration_meta):
-                    needed_servers.append(server)
-            else:
-                needed_servers.append(server)
-
         result_subnets = {}
 
+        # Finding the subnet of every active server in a single pass
+        subnet_servers = SubnetIndex(
+            [sub.cidr for sub in needed_subnets]).assign(active_servers)
+
         for sub in needed_subnets:
             cidr = sub.cidr
             subnet_id = sub.id
@@ -444,15 +438,7 @@ class ZoneCollector(Collector):
             if cidr not in result_subnets:
                 result_subnets[cidr] = {}
                 result_subnets[cidr]['id'] = subnet_id
-                result_subnets[cidr]['vms'] = []
-
-            for server in active_servers:
-                if bool(server.addresses) == True:
-                    network_key = list(server.addresses)[0]
-                    ip = server.addresses[network_key][0]['addr']
-                    # If IP address is in the subnet range we increment the server count
-                    if ipaddress.ip_address(ip) in ipaddress.ip_network(cidr):
-                        result_subnets[cidr]['vms'].append(server)
+                result_subnets[cidr]['vms'] = subnet_servers.get(cidr, [])
 
         def collect_subnet_data(result_subnets):
             subnet_data = []
@@ -463,45 +449,23 @@ class ZoneCollector(Collector):
                 subnet_vms = result_subnets[subnet]['vms']
 
                 subnet_obj['subnet'] = f"{subnet} - {result_subnets[subnet]['id']}"
-                zones = []
-                zones_vms = {}
-                subnet_obj['zones'] = get_zones_data(
-                    zones_vms, zones, subnet_vms)
+                subnet_obj['zones'] = get_zones_data(subnet_vms)
                 subnet_data.append(subnet_obj)
             return subnet_data
 
-        def get_zones_data(zones_vms, zones, subnet_vms):
-            for server in subnet_vms:
-                zone = server['OS-EXT-AZ:availability_zone']
-                if zone not in zones:
-                    zones.append(zone)
-                    zones_vms[zone] = []
-                    zones_vms[zone].append(server)
-                else:
-                    zones_vms[zone].append(server)
-
+        def get_zones_data(subnet_vms):
             zones_data = []
-            for zone in zones_vms:
-                vms = zones_vms[zone]
-                count = len(vms)
-                do_not_migrate_vms = len([
-                    vm for vm in vms if vm.project_id in do_not_migrate_projects])
-                migrated_vms = ([vm for vm in vms if "migration_dst" in vm.metadata.keys()
-                                 and any(s.id == vm.metadata['migration_dst'] for s in dest_servers_with_migration_meta)])
-                migrated_active = len(
-                    [vm for vm in migrated_vms if vm.status == 'ACTIVE'])
-                migrated_inactive = len(
-                    [vm for vm in migrated_vms if vm.status != 'ACTIVE'])
-                unlinked_vms = len(
-                    [vm for vm in vms if vm.project_id in projects_with_no_migrate_meta])
-                to_be_migrated = count - do_not_migrate_vms - unlinked_vms
+            # Counting the migration state of every zone in a single pass over the subnet VMs
+            zones_counters = classifier.classify(
+                subnet_vms, key=lambda vm: vm['OS-EXT-AZ:availability_zone'])
+            for zone, counters in zones_counters.items():
                 zones_data.append({'zone': zone,
-                                   'count': count,
-                                   'migrated_active': migrated_active,
-                                   'migrated_inactive': migrated_inactive,
-                                   'do_not_migrate': do_not_migrate_vms,
-                                   'unlinked': unlinked_vms,
-                                   'to_be_migrated': to_be_migrated})
+                                   'count': counters.count,
+                                   'migrated_active': counters.migrated_active,
+                                   'migrated_inactive': counters.migrated_inactive,
+                                   'do_not_migrate': counters.do_not_migrate,
+                                   'unlinked': counters.unlinked,
+                                   'to_be_migrated': counters.to_be_migrated})
             return zones_data
 
         result_data = collect_subnet_data(result_subnets)
@@ -521,112 +485,44 @@ class ZoneCollector(Collector):
 
 class CombinedZoneCollector(Collector):
     def get_resources(self, env, json_output):
-        cli = self._get_client(env)
+        inventory = self._get_inventory(env)
+        dest_env = migration_clouds[env]
+        # Fetching the source listings and the destination servers at the same time
+        self.inventory.prefetch({env: ['servers', 'projects'], dest_env: ['servers']})
 
         # Getting a list of all servers
-        servers = cli.list_servers(
-            all_projects=True, bare=True, filters={'limit': 1000})
+        servers = inventory.servers()
 
-        # Getting a list of all projects
-        projects = cli.list_projects()
+        # Getting the projects indexed by ID
+        project_index = inventory.project_index()
 
-        # Filtering only the projects that don't have the migrate_to metadata
-        projects_with_no_migrate_meta = [
-            p.id for p in projects if 'migrate_to' not in p.meta]
-
-        # Filtering projects that have "do_not_migrate" tag
-        do_not_migrate_projects = [p.id for p in projects if p.meta.get(
-            'migrate_to') == "do_not_migrate"]
-
-        # Servers mapping:
-        server_map = {
-            'iad_private': 'iad_osng',
-            'phx_private': 'phx_osng',
-            'sin_private': 'sin_osng'
-        }
+        # Getting destination VMs that contain migration metadata
+        dest_servers_with_migration_meta = self._get_inventory(
+            dest_env).migration_targets()
 
-        # Getting destination cloud data
-        dest_cli = self._get_client(server_map[env])
-        dest_servers = dest_cli.list_servers(
-            all_projects=True, bare=True, filters={'limit': 1000})
+        classifier = MigrationClassifier(
+            project_index, dest_servers_with_migration_meta)
 
-        # Filtering destination VMs that contain migration metadata
-        dest_servers_with_migration_meta = [
-            s for s in dest_servers if "migration_src" in s.metadata.keys()]
+        def is_needed_zone(zone):
+            if 'gen' in zone:
+                return False
+            return not (env == 'sin_private' and 'prd' in zone)
 
         def get_zones(servers):
-            zones = []
-            zones_vms = {}
+            needed_servers = [
+                s for s in servers if is_needed_zone(s['OS-EXT-AZ:availability_zone'])]
+            # Counting the migration state of every zone in a single pass over the servers
+            return classifier.classify(
+                needed_servers, key=lambda vm: vm['OS-EXT-AZ:availability_zone'])
 
-            for server in servers:
-                zone = server['OS-EXT-AZ:availability_zone']
-                if 'gen' not in zone:
-                    if env == 'sin_private' and 'prd' in zone:
-                        continue
-                    else:
-                        if zone not in zones:
-                            zones.append(zone)
-                            zones_vms[zone] = []
-                            zones_vms[zone].append(server)
-                        else:
-                            zones_vms[zone].append(server)
-            return zones_vms
-
-        def get_active_vms(vms):
-            active_vms = [vm for vm in vms if vm.status == 'ACTIVE']
-            return active_vms
-
-        def get_migrated_vms(vms, dest_servers_with_migration_meta):
-            migrated = ([vm for vm in vms if "migration_dst" in vm.metadata.keys()
-                         and any(s.id == vm.metadata['migration_dst'] for s in dest_servers_with_migration_meta)])
-            return migrated
-
-        def get_migrated_active_vms(migrated):
-            migrated_active = len(
-                [vm for vm in migrated if vm.status == 'ACTIVE'])
-            return migrated_active
-
-        def get_migrated_inactive_vms(migrated):
-            migrated_inactive = len(
-                [vm for vm in migrated if vm.status != 'ACTIVE'])
-            return migrated_inactive
-
-        def get_do_not_migrate_vms(active_vms, do_not_migrate_projects):
-            do_not_migrate_vms = len([
-                vm for vm in active_vms if vm.project_id in do_not_migrate_projects])
-            return do_not_migrate_vms
-
-        def get_unlinked_vms(active_vms, projects_with_no_migrate_meta):
-            unlinked_vms = len([
-                vm for vm in active_vms if vm.project_id in projects_with_no_migrate_meta])
-            return unlinked_vms
-
-        def get_to_be_migrated(active_vms, do_not_migrate_vms, unlinked_vms):
-            to_be_migrated = len(active_vms) - \
-                do_not_migrate_vms - unlinked_vms
-            return to_be_migrated
-
-        def get_result_zones(zones_vms, do_not_migrate_projects, projects_with_no_migrate_meta, dest_servers_with_migration_meta):
+        def get_result_zones(zones_counters):
             result_zones = []
-            for zone in zones_vms:
-                vms = zones_vms[zone]
-                active_vms = get_active_vms(vms)
-                migrated = get_migrated_vms(
-                    vms, dest_servers_with_migration_meta)
-                migrated_active = get_migrated_active_vms(migrated)
-                migrated_inactive = get_migrated_inactive_vms(migrated)
-                do_not_migrate_vms = get_do_not_migrate_vms(
-                    active_vms, do_not_migrate_projects)
-                unlinked_vms = get_unlinked_vms(
-                    active_vms, projects_with_no_migrate_meta)
-                to_be_migrated = get_to_be_migrated(
-                    active_vms, do_not_migrate_vms, unlinked_vms)
-                result_zones.append({'zone': zone, 'count': len(active_vms), 'migrated_inactive': migrated_inactive, 'migrated_active': migrated_active,
-                                    'do_not_migrate': do_not_migrate_vms, 'unlinked': unlinked_vms, 'to_be_migrated': to_be_migrated})
+            for zone, counters in zones_counters.items():
+                result_zones.append({'zone': zone, 'count': counters.active, 'migrated_inactive': counters.migrated_inactive, 'migrated_active': counters.migrated_active,
+                                    'do_not_migrate': counters.do_not_migrate, 'unlinked': counters.unlinked, 'to_be_migrated': counters.to_be_migrated})
             return result_zones
 
-        result_zones = get_result_zones(get_zones(
-            servers), do_not_migrate_projects, projects_with_no_migrate_meta, dest_servers_with_migration_meta)
+        result_zones = get_result_zones(get_zones(servers))
 
         if json_output:
             return {env: result_zones}
@@ -640,58 +536,31 @@ class CombinedZoneCollector(Collector):
 
 class SubnetCollector(Collector):
     def get_resources(self, env, usage, json_output):
-        cli = self._get_client(env)
+        inventory = self._get_inventory(env)
+        # Fetching the source listings and the destination servers at the same time
+        self.inventory.prefetch({env: ['subnets', 'servers', 'networks', 'projects'],
+                                 migration_clouds[env]: ['servers']})
 
         # Getting a list of all subnets
-        subnets = cli.list_subnets()
+        subnets = inventory.subnets()
         # Getting a list of all servers
-        servers = cli.list_servers(
-            all_projects=True, bare=True, filters={'limit': 1000})
+        servers = inventory.servers()
 
         # Getting a list of all networks
-        networks = cli.list_networks()
-
-        # Getting a list of all projects
-        try:
-            projects = cli.list_projects()
-        except JSONDecodeError:
-            # This likes to error randomly in phx_private
-            print(f"Error listing projects from cloud {env} - trying one more time.")
-            sleep(10)
-            projects = cli.list_projects()
+        networks = inventory.networks()
 
-        # Filtering projects that have "do_not_migrate" tag
-        do_not_migrate_projects = [p.id for p in projects if p.meta.get(
-            'migrate_to') == "do_not_migrate"]
-
-        # Filtering only the projects that don't have the migrate_to metadata
-        projects_with_no_migrate_meta = [
-            p.id for p in projects if 'migrate_to' not in p.meta]
+        # Getting the projects indexed by ID
+        project_index = inventory.project_index()
 
         # Filtering the subnets to get only the once that are not floating
         needed_subnets = [
             s for s in subnets if 'floating' not in s.name and 'lbaas' not in s.name]
 
-        # Servers mapping:
-        def get_dest_servers_with_migration_meta(env):
-            server_map = {
-                'iad_private': 'iad_osng',
-                'phx_private': 'phx_osng',
-                'sin_private': 'sin_osng'
-            }
-
-            # Getting destination cloud data
-            dest_cli = self._get_client(server_map[env])
-            dest_servers = dest_cli.list_servers(
-                all_projects=True, bare=True, filters={'limit': 1000})
-
-            # Filtering destination VMs that contain migration metadata
-            dest_servers_with_migration_meta = [
-                s for s in dest_servers if "migration_src" in s.metadata.keys()]
-
-            return dest_servers_with_migration_meta
+        # Getting destination VMs that contain migration metadata
+        dest_servers = self._get_inventory(
+            migration_clouds[env]).migration_targets()
 
-        dest_servers = get_dest_servers_with_migration_meta(env)
+        classifier = MigrationClassifier(project_index, dest_servers)
 
         # Iterating through all subnets and servers to find which servers use which subnets
         def get_network_name(network_id, networks):
@@ -700,7 +569,7 @@ class SubnetCollector(Collector):
                     return n.name
             return ''
 
-        def process_subnet(sub, networks, servers, env, result_subnets):
+        def process_subnet(sub, networks, env, result_subnets):
             cidr = sub.cidr
             subnet_name = sub.name
             subnet_id = sub.id
@@ -714,8 +583,6 @@ class SubnetCollector(Collector):
                     result_subnets[cidr] = create_subnet_dict(
                         subnet_name, subnet_id, network_name)
 
-                add_servers_to_subnet(servers, cidr, result_subnets)
-
         def should_skip_subnet(network_name, env):
             return ('gen' in network_name) or (env == 'sin_private' and 'prd' in network_name)
 
@@ -732,30 +599,30 @@ class SubnetCollector(Collector):
                 'zones': []
             }
 
-        def add_servers_to_subnet(servers, cidr, result_subnets):
-            for server in servers:
-                if bool(server.addresses) == True:
-                    network_key = list(server.addresses)[0]
-                    ip = server.addresses[network_key][0]['addr']
-
-                    if ipaddress.ip_address(ip) in ipaddress.ip_network(cidr):
-                        result_subnets[cidr]['vms'].append(server)
+        def add_servers_to_subnet(subnet_servers, cidr, result_subnets):
+            for server in subnet_servers:
+                result_subnets[cidr]['vms'].append(server)
 
-                        server_hypervisor = server.hypervisor_hostname
+                server_hypervisor = server.hypervisor_hostname
 
-                        if server_hypervisor not in result_subnets[cidr]['hvs']:
-                            result_subnets[cidr]['hvs'].append(
-                                server_hypervisor)
+                if server_hypervisor not in result_subnets[cidr]['hvs']:
+                    result_subnets[cidr]['hvs'].append(
+                        server_hypervisor)
 
-                        zone = server['OS-EXT-AZ:availability_zone']
+                zone = server['OS-EXT-AZ:availability_zone']
 
-                        if zone not in result_subnets[cidr]['zones']:
-                            result_subnets[cidr]['zones'].append(zone)
+                if zone not in result_subnets[cidr]['zones']:
+                    result_subnets[cidr]['zones'].append(zone)
 
         def process_subnets(needed_subnets, networks, servers, env):
             result_subnets = {}
             for sub in needed_subnets:
-                process_subnet(sub, networks, servers, env, result_subnets)
+                process_subnet(sub, networks, env, result_subnets)
+            # Finding the subnet of every server in a single pass
+            subnet_servers = SubnetIndex(result_subnets).assign(servers)
+            for cidr in result_subnets:
+                add_servers_to_subnet(
+                    subnet_servers.get(cidr, []), cidr, result_subnets)
             return result_subnets
 
         headers = ['Subnet', 'Name', 'Subnet ID',
@@ -765,69 +632,42 @@ class SubnetCollector(Collector):
             needed_subnets, networks, servers, env)
         subnets_data = []
 
-        def subnet_total_usage(subnet, active_vms, do_not_migrate_vms, unlinked_vms):
-            if "Total usage" not in headers:
-                headers.append('Total usage')
-            # Collecting current subnet hypervisors
-            subnet_hvs = result_subnets[subnet]['hvs']
-            # Collecting current subnet servers
-            to_be_migrated_vms = [vm for vm in active_vms if vm not in do_not_migrate_vms and vm not in unlinked_vms]
-            # Filtering current subnet servers to select only IDs
-            subnet_vms_ids = [vm.id for vm in to_be_migrated_vms]
-            # Getting each VM disk usage on the subnet hypervisors
-            total_subnet_disk_usage = 0
-            if len(subnet_hvs) != 0:
-                vm_data = vm_disk_usage(
-                    [hv for hv in subnet_hvs if hv is not None])
-                for vm in vm_data:
-                    if vm in subnet_vms_ids:
-                        current_vm_disk_usage = vm_data[vm]
-                        if 'G' in current_vm_disk_usage:
-                            total_subnet_disk_usage += float(
-                                current_vm_disk_usage.replace("G", "")) * 1024
-                        elif "M" in current_vm_disk_usage:
-                            total_subnet_disk_usage += float(
-                                current_vm_disk_usage.replace("M", ""))
-            return f"{round(total_subnet_disk_usage / 1024, 1)}G"
+        # VMs to be migrated of every subnet, the only ones the total usage is needed for
+        subnets_to_be_migrated = []
 
         for subnet in result_subnets:
             subnet_obj = {}
 
-            # Collecting all active VMs on the subnet
-            active_vms = [vm for vm in result_subnets[subnet]
-                          ['vms'] if vm.status == 'ACTIVE']
-            migrated_vms = [vm for vm in result_subnets[subnet]['vms'] if "migration_dst" in vm.metadata.keys(
-            ) and any(s.id == vm.metadata['migration_dst'] for s in dest_servers)]
-            migrated_active = len(
-                [vm for vm in migrated_vms if vm.status == 'ACTIVE'])
-            migrated_inactive = len(
-                [vm for vm in migrated_vms if vm.status != 'ACTIVE'])
-            do_not_migrate_vms = [
-                vm for vm in active_vms if vm.project_id in do_not_migrate_projects]
-            unlinked_vms = [
-                vm for vm in active_vms if vm.project_id in projects_with_no_migrate_meta]
+            # Counting the migration state of all VMs on the subnet in a single pass
+            counters = classifier.summarize(result_subnets[subnet]['vms'])
             subnet_obj = {
                 'subnet': subnet,
                 'name': result_subnets[subnet]['name'],
                 'subnet_id': result_subnets[subnet]['id'],
                 'network_zone': result_subnets[subnet]['network_zone'],
-                'count': len(result_subnets[subnet]['vms']),
-                'active': len(active_vms),
-                'migrated_active': migrated_active,
-                'migrated_inactive': migrated_inactive,
-                'do_not_migrate': len(do_not_migrate_vms),
-                'unlinked': len(unlinked_vms),
-                'to_be_migrated': len(active_vms) - len(do_not_migrate_vms) - len(unlinked_vms),
+                'count': counters.count,
+                'active': counters.active,
+                'migrated_active': counters.migrated_active,
+                'migrated_inactive': counters.migrated_inactive,
+                'do_not_migrate': counters.do_not_migrate,
+                'unlinked': counters.unlinked,
+                'to_be_migrated': counters.to_be_migrated,
                 'hypervisors': len(result_subnets[subnet]['hvs']),
                 'zones': result_subnets[subnet]['zones']
             }
 
-            if usage:
-                subnet_obj['total_usage'] = subnet_total_usage(subnet, active_vms,
-                                                               do_not_migrate_vms, unlinked_vms)
-
+            subnets_to_be_migrated.append(counters.to_be_migrated_vms)
             subnets_data.append(subnet_obj)
 
+        if usage:
+            headers.append('Total usage')
+            # Getting the disk usage of every VM to be migrated in a single sweep
+            vm_data = inventory.vm_disk_usage(
+                vm_ids=[vm.id for vms in subnets_to_be_migrated for vm in vms])
+            for subnet_obj, to_be_migrated_vms in zip(subnets_data, subnets_to_be_migrated):
+                total_subnet_disk_usage = sum(vm_data.get(vm.id, 0) for vm in to_be_migrated_vms)
+                subnet_obj['total_usage'] = f"{round(total_subnet_disk_usage / GIB, 1)}G"
+
         if json_output:
             return {env: sorted(subnets_data, key=lambda x: int((x['count'])), reverse=True)}
         else:
@@ -839,22 +679,26 @@ class SubnetCollector(Collector):
 
 class VMsPerSubnetCollector(Collector):
     def get_resources(self, env, json_output):
-        cli = self._get_client(env)
+        inventory = self._get_inventory(env)
+        # Fetching all the listings this report needs at the same time
+        inventory.prefetch('subnets', 'servers', 'networks')
 
         # Getting a list of all subnets
-        subnets = cli.list_subnets()
+        subnets = inventory.subnets()
 
         # Getting a list of all servers
-        servers = cli.list_servers(
-            all_projects=True, bare=True, filters={'limit': 1000})
+        servers = inventory.servers()
 
         # Getting a list of all networks
-        networks = cli.list_networks()
+        networks = inventory.networks()
 
         # Creating an empty result object
         result_subnets = {}
 
-        # Iterating through all subnets and servers to find which servers use which subnets
+        # Finding the subnet of every server in a single pass
+        subnet_servers = SubnetIndex([sub.cidr for sub in subnets]).assign(servers)
+
+        # Iterating through all subnets to collect the servers using them
         for sub in subnets:
             cidr = sub.cidr
             subnet_id = sub.id
@@ -867,51 +711,33 @@ class VMsPerSubnetCollector(Collector):
                 result_subnets[cidr]['network_zone'] = network_name
                 result_subnets[cidr]['vms'] = []
                 result_subnets[cidr]['hvs'] = []
-            for server in servers:
-                if bool(server.addresses) == True:
-                    network_key = list(server.addresses)[0]
-                    ip = server.addresses[network_key][0]['addr']
-                    # If IP address is in the subnet range we increment the server count
-                    if ipaddress.ip_address(ip) in ipaddress.ip_network(cidr):
-                        result_subnets[cidr]['vms'].append(server)
-
-                        # Collecting the hypervisor the VM is hosted on
-                        server_hypervisor = server.hypervisor_hostname
-                        # Adding the HV if not in the subnet list already
-                        if server_hypervisor not in result_subnets[cidr]['hvs']:
-                            result_subnets[cidr]['hvs'].append(
-                                server_hypervisor)
+                for server in subnet_servers.get(cidr, []):
+                    result_subnets[cidr]['vms'].append(server)
+
+                    # Collecting the hypervisor the VM is hosted on
+                    server_hypervisor = server.hypervisor_hostname
+                    # Adding the HV if not in the subnet list already
+                    if server_hypervisor not in result_subnets[cidr]['hvs']:
+                        result_subnets[cidr]['hvs'].append(
+                            server_hypervisor)
 
         headers = ['ID', 'Hypervisor', 'Disk usage', "Created by", 'Zone']
 
         subnets_data = []
 
+        # Getting each VM disk usage on all subnet hypervisors in a single sweep
+        vm_data = subnets_disk_usage(inventory, result_subnets)
+
         for subnet in result_subnets:
             subnet_obj = {}
-            # Collecting current subnet hypervisors
-            subnet_hvs = result_subnets[subnet]['hvs']
             # Collecting current subnet servers
             subnet_vms = result_subnets[subnet]['vms']
-            # Filtering current subnet servers to select only IDs
-            subnet_vms_ids = [vm.id for vm in subnet_vms]
-            # Getting each VM disk usage on the subnet hypervisors
-            total_subnet_disk_usage = 0
-            if len(subnet_hvs) != 0:
-                vm_data = vm_disk_usage(
-                    [hv for hv in subnet_hvs if hv is not None])
-                for vm in vm_data:
-                    if vm in subnet_vms_ids:
-                        current_vm_disk_usage = vm_data[vm]
-                        if 'G' in current_vm_disk_usage:
-                            total_subnet_disk_usage += float(
-                                current_vm_disk_usage.replace("G", "")) * 1024
-                        elif "M" in current_vm_disk_usage:
-                            total_subnet_disk_usage += float(
-                                current_vm_disk_usage.replace("M", ""))
-
-            if round(total_subnet_disk_usage / 1024, 1) > 0:
+            # Summing the disk usage of the current subnet servers
+            total_subnet_disk_usage = sum(vm_data.get(vm.id, 0) for vm in subnet_vms)
+
+            if round(total_subnet_disk_usage / GIB, 1) > 0:
                 subnet_obj[
-                    'subnet'] = f"{subnet} - {result_subnets[subnet]['id']} - {round(total_subnet_disk_usage / 1024, 1)}G"
+                    'subnet'] = f"{subnet} - {result_subnets[subnet]['id']} - {round(total_subnet_disk_usage / GIB, 1)}G"
                 vm_list = []
 
                 for vm in result_subnets[subnet]['vms']:
@@ -919,11 +745,7 @@ class VMsPerSubnetCollector(Collector):
                     vm_hv = vm.hypervisor_hostname
                     vm_metadata = vm.metadata
                     av_zone = vm['OS-EXT-AZ:availability_zone']
-                    # current_vm_disk_usage = vm_data[vm_id]
-                    if (vm_id in vm_data):
-                        current_vm_disk_usage = vm_data[vm_id]
-                    else:
-                        current_vm_disk_usage = 0
+                    current_vm_disk_usage = format_size(vm_data.get(vm_id, 0))
                     if json_output:
                         vm_list.append({'id': vm_id, 'hypervisor': vm_hv,
                                         'usage': current_vm_disk_usage, 'metadata': vm_metadata, 'zone': av_zone})
@@ -952,10 +774,12 @@ class VMsPerSubnetCollector(Collector):
 
 class VMsPerHypervisorCollector(Collector):
     def get_resources(self, env, json_output):
-        cli = self._get_client(env)
+        inventory = self._get_inventory(env)
+        # Fetching all the listings this report needs at the same time
+        inventory.prefetch('hypervisors', 'servers', 'flavors')
 
         # Getting all hypervisors
-        hypervisors = cli.list_hypervisors()
+        hypervisors = inventory.hypervisors()
 
         # Filling the table rows only with the needed columns
         # hypervisors_data = []
@@ -965,69 +789,63 @@ class VMsPerHypervisorCollector(Collector):
         #      f"{round(hypervisor.local_disk_size/1024, 2)} TB", f"{hypervisor.local_disk_used} GB",
         #      f"{hypervisor.local_disk_free} GB", round((hypervisor.local_disk_used/hypervisor.local_disk_size) * 100, 1), hypervisor.running_vms])
 
-        hv_json_data = []
-
-        # Getting all servers
-        servers = cli.list_servers(
-            all_projects=True, bare=True, filters={'limit': 1000})
-        # Getting all flavors
-        flavors = cli.list_flavors()
+        # Getting all servers grouped by hypervisor
+        hypervisor_index = inventory.hypervisor_index()
+        # Getting the flavors keyed by ID and name
+        flavors = inventory.flavor_index()
         # Creating a list of Hypervisor hostnames
         hypervisors_list = [h.name for h in hypervisors]
-        # Getting a dictionary containing all VMs and their real disk usage
-        vm_data = vm_disk_usage(hypervisors_list)
-
-        if json_output == False:
-            self.print_general_info(env, hypervisors)
-
-        for hv in hypervisors_list:
-            # Creating list of VMs on the current Hypervisor
-            current_hv_vm_list = [
-                srv for srv in servers if srv.hypervisor_hostname == hv]
-            # If there are no VMs on this HV we skip this HV
-            if len(current_hv_vm_list) == 0:
-                continue
 
-            # Getting list of VMs UUIDs and real disk usage from the usage ansible module
-            if json_output:
-                hv_vm_list = []
-                for server in current_hv_vm_list:
-                    flavor = [f for f in flavors if f.id ==
-                              server.flavor.id or f.name == server.flavor.id][0]
-                    if server.id not in vm_data:
-                        continue
-                    real_usage = vm_data[server.id]
-                    real_usage = format_disk_usage(real_usage)
-                    hv_vm_list.append({
-                        'name': server.name, 'state': server.status, 'uuid': server.id,
-                        'allocated_disk': f"{flavor.disk}G", 'disk_usage': vm_data[server.id],
-                        'use_percentage': round((float(real_usage) / flavor.disk) * 100, 1)
-                    })
+        if json_output:
+            # Getting a dictionary containing all VMs and their real disk usage
+            vm_data = inventory.vm_disk_usage(hypervisors_list)
+            hv_json_data = []
+            for hv in hypervisors_list:
+                rows = self.get_hypervisor_rows(hv, hypervisor_index, flavors, vm_data)
+                # If there are no VMs on this HV we skip this HV
+                if rows is None:
+                    continue
+                hv_json_data.append({hv: [{
+                    'name': name, 'state': state, 'uuid': uuid, 'allocated_disk': allocated,
+                    'disk_usage': usage, 'use_percentage': use_percentage
+                } for name, state, uuid, allocated, usage, use_percentage in rows]})
+            return {env: hv_json_data}
+
+        self.print_general_info(env, hypervisors)
+
+        def print_hypervisor(hv, hv_disk_usage):
+            # Printing each hypervisor as soon as its disk usage is known
+            rows = self.get_hypervisor_rows(hv, hypervisor_index, flavors, hv_disk_usage)
+            if rows is None:
+                return
+            print('----------------------------------------------')
+            print(f"Hypervisor: {hv}")
+            vm_usage_headers = ['Name', 'State', 'UUID',
+                                'Allocated disk', 'Disk Usage', 'Use %']
+            data = sorted(rows, key=lambda x: int(x[5]), reverse=True)
+            vm_table = Table(vm_usage_headers, data)
+            vm_table.print_table()
 
-                    hv_json_data.append({hv: hv_vm_list})
-            else:
-                print('----------------------------------------------')
-                print(f"Hypervisor: {hv}")
-                vm_usage_headers = ['Name', 'State', 'UUID',
-                                    'Allocated disk', 'Disk Usage', 'Use %']
-
-                data = []
-                for server in current_hv_vm_list:
-
-                    # Getting the server flavor
-                    flavor = [f for f in flavors if f.id ==
-                              server.flavor.id or f.name == server.flavor.id][0]
-                    if server.id not in vm_data:
-                        continue
-                    real_usage = vm_data[server.id]
-                    real_usage = format_disk_usage(real_usage)
-                    data.append([server.name, server.status, server.id, f"{flavor.disk}G", vm_data[server.id], round(
-                        (float(real_usage) / flavor.disk) * 100, 1)])
-                data = sorted(data, key=lambda x: int(x[5]), reverse=True)
-                vm_table = Table(vm_usage_headers, data)
-                vm_table.print_table()
-            if json_output:
-                return {env: hv_json_data}
+        inventory.vm_disk_usage(hypervisors_list, consumer=print_hypervisor)
+
+    @classmethod
+    def get_hypervisor_rows(self, hv, hypervisor_index, flavors, vm_data):
+        # Creating list of VMs on the current Hypervisor
+        current_hv_vm_list = hypervisor_index.servers(hv)
+        if len(current_hv_vm_list) == 0:
+            return None
+
+        # Getting list of VMs UUIDs and real disk usage from the usage ansible module
+        data = []
+        for server in current_hv_vm_list:
+            if server.id not in vm_data:
+                continue
+            real_usage = vm_data[server.id]
+            # Getting the server flavor
+            flavor = flavors.get(server)
+            data.append([server.name, server.status, server.id, f"{flavor.disk}G", format_size(real_usage),
+                         disk_use_percentage(real_usage, flavor.disk, 1)])
+        return data
 
     @classmethod
     def print_general_info(self, env, hypervisors):
@@ -1042,23 +860,22 @@ class VMsPerHypervisorCollector(Collector):
 
 class ProjectCollector(Collector):
     def get_resources(self, env, json_output):
-        cli = self._get_client(env)
-        # Getting a list of all servers
-        servers = cli.list_servers(
-            all_projects=True, bare=True, filters={'limit': 1000})
-        # Getting a list of all projects
-        projects = cli.list_projects()
+        inventory = self._get_inventory(env)
+        # Fetching all the listings this report needs at the same time
+        inventory.prefetch('servers', 'projects')
+        # Getting the projects indexed by ID, with their servers
+        project_index = inventory.project_index()
         # Filtering only the projects that don't have the migrate_to metadata
         projects_with_no_migrate_meta = [
-            p for p in projects if 'migrate_to' not in p.meta]
+            p for p in project_index.projects() if p.id in project_index.unlinked]
         # Creating an empty data array
         projects_data = []
 
         for project in projects_with_no_migrate_meta:
             # For each project getting only name, id, owning group and list of VMs under that project
             project_obj = {
-                'project': f"{project.name} - {project.id} - {self._owning_group_formatter(project.meta.get('owning_group', 'Unknown'))}", 'vm_list': []}
-            vm_list = [s for s in servers if s.project_id == project.id]
+                'project': f"{project.name} - {project.id} - {self._owning_group_formatter(project_meta(project).get('owning_group', 'Unknown'))}", 'vm_list': []}
+            vm_list = project_index.servers(project.id)
 
             for vm in vm_list:
                 # For each VM under the project getting only the important data
@@ -1085,21 +902,19 @@ class ProjectCollector(Collector):
 
 class EmptyProjectCollector(Collector):
     def get_resources(self, env, json_output):
-        cli = self._get_client(env)
+        inventory = self._get_inventory(env)
+        # Fetching all the listings this report needs at the same time
+        inventory.prefetch('servers', 'projects')
 
-        # Getting a list of all servers
-        servers = cli.list_servers(
-            all_projects=True, bare=True, filters={'limit': 1000})
-        # Getting a list of all projects
-        projects = cli.list_projects()
+        # Getting the projects indexed by ID, with their servers
+        project_index = inventory.project_index()
 
         projects_data = []
 
-        for project in projects:
-            vm_list = [s for s in servers if s.project_id == project.id]
-            if len(vm_list) == 0:
+        for project in project_index.projects():
+            if len(project_index.servers(project.id)) == 0:
                 projects_data.append({'name': project.name, 'id': project.id,
-                                     'owning_group': self._owning_group_formatter(project.meta.get('owning_group', 'Unknown'))})
+                                     'owning_group': self._owning_group_formatter(project_meta(project).get('owning_group', 'Unknown'))})
 
         if json_output:
             return {env: projects_data}
@@ -1131,18 +946,12 @@ class ProjectValidator(Collector):
         return projects
 
     def _get_destination_cloud_data(self, env):
-        cloud_map = {
-            'iad_private': 'iad_osng',
-            'phx_private': 'phx_osng',
-            'sin_private': 'sin_osng',
-            'phx_understage': 'phx_nxt_2'
-        }
         # Getting destination cloud data
-        dst_cli = self._get_client(cloud_map[env])
+        dst_inventory = self._get_inventory(migration_clouds[env])
         # Getting destination cloud projects
-        dst_projects = dst_cli.list_projects()
-        dst_project_ids = [p.id for p in dst_projects]
-        dst_project_names = [p.name for p in dst_projects]
+        dst_projects = dst_inventory.projects()
+        dst_project_ids = {p.id for p in dst_projects}
+        dst_project_names = {p.name for p in dst_projects}
         return dst_project_ids, dst_project_names
 
     def _get_projects_to_migrate(self, projects, dst_project_ids, dst_project_names):
@@ -1162,64 +971,27 @@ class ProjectValidator(Collector):
 
 class VMsWithMultipleFipsCollector(Collector):
     def get_resources(self, env, json_output):
-        cli = self._get_client(env)
+        inventory = self._get_inventory(env)
+        # Fetching all the listings this report needs at the same time
+        inventory.prefetch('servers', 'projects', 'ports', 'floating_ips')
 
         # Getting a list of all servers
-        servers = cli.list_servers(
-            all_projects=True, bare=True, filters={'limit': 1000})
+        servers = inventory.servers()
 
-        def generate_do_not_migrate_project_ids(cli):
-            # Set the pagination size to 50 projects per page
-            # Adjust this value as needed
-            pagination_size = 50
-
-            # Use the `limit` and `marker` parameters to paginate the results
-            marker = None
-            projects = []
-
-            while True:
-                page = cli.identity.projects(
-                    limit=pagination_size, marker=marker)
-
-                if not page:
-                    break
-
-                projects.extend(page)
-                marker = page[-1].id
-
-            do_not_migrate_projects = [
-                p for p in projects
-                if p.get('meta', {}).get('migrate_to') == 'do_not_migrate'
-            ]
-            do_not_migrate_project_ids = [
-                p.id for p in do_not_migrate_projects]
-
-            return do_not_migrate_project_ids
-
-        ports = cli.list_ports()
-        floating_ips = cli.list_floating_ips()
+        # Getting the floating IPs of every server from the ports and floating IPs joined once
+        port_index = inventory.port_index()
 
         server_data = []
 
         headers = ['Name', 'ID', 'Owning group', 'FIPs']
 
-        def get_floating_ips(server):
-            fips = []
-            server_ports = [p for p in ports if p["device_id"] == server.id]
-            for port in server_ports:
-                port_flips = [
-                    f for f in floating_ips if f["port_id"] == port.id]
-                for fip in port_flips:
-                    fips.append(fip.floating_ip_address)
-            return fips
-
-        do_not_migrate_project_ids = generate_do_not_migrate_project_ids(cli)
+        do_not_migrate_project_ids = inventory.project_index().do_not_migrate
 
         needed_servers = [
             s for s in servers if s.project_id not in do_not_migrate_project_ids]
 
         for server in needed_servers:
-            server_fips = get_floating_ips(server)
+            server_fips = port_index.floating_ips(server.id)
 
             if len(server_fips) > 1:
                 server_data.append({'name': server.name, 'id': server.id, 'owning_group': self._owning_group_formatter(server.metadata.get(
@@ -1238,16 +1010,17 @@ class VMsWithMultipleFipsCollector(Collector):
 
 class OwningGroupCollector(Collector):
     def get_resources(self, env, group):
-        cli = self._get_client(env)
+        inventory = self._get_inventory(env)
+        # Fetching all the listings this report needs at the same time
+        inventory.prefetch('subnets', 'servers', 'networks')
 
         # Getting a list of all subnets
-        subnets = cli.list_subnets()
+        subnets = inventory.subnets()
         # Getting a list of all servers
-        servers = cli.list_servers(
-            all_projects=True, bare=True, filters={'limit': 1000})
+        servers = inventory.servers()
 
         # Getting a list of all networks
-        networks = cli.list_networks()
+        networks = inventory.networks()
 
         needed_servers = [s for s in servers if group.lower(
         ) in s.metadata['owning_group'].lower()]
@@ -1255,7 +1028,10 @@ class OwningGroupCollector(Collector):
         # Creating an empty result object
         result_subnets = {}
 
-        # Iterating through all subnets and servers to find which servers use which subnets
+        # Finding the subnet of every needed server in a single pass
+        subnet_servers = SubnetIndex([sub.cidr for sub in subnets]).assign(needed_servers)
+
+        # Iterating through all subnets to collect the servers using them
         for sub in subnets:
             cidr = sub.cidr
             subnet_id = sub.id
@@ -1267,15 +1043,8 @@ class OwningGroupCollector(Collector):
                     'name': sub.cidr,
                     'id': subnet_id,
                     'network_zone': network_name,
-                    'vms': []
+                    'vms': subnet_servers.get(cidr, [])
                 }
-            for server in needed_servers:
-                if bool(server.addresses) == True:
-                    network_key = list(server.addresses)[0]
-                    ip = server.addresses[network_key][0]['addr']
-                    # If IP address is in the subnet range we increment the server count
-                    if ipaddress.ip_address(ip) in ipaddress.ip_network(cidr):
-                        result_subnets[cidr]['vms'].append(server)
 
         needed_subnets = []
 
@@ -1306,15 +1075,11 @@ class OwningGroupCollector(Collector):
 
 class UnlinkedCollector(Collector):
     def get_resources(self, env, zone):
-        cli = self._get_client(env)
+        inventory = self._get_inventory(env)
 
-        servers = cli.list_servers(
-            all_projects=True, bare=True, filters={'limit': 1000, 'vm_state': 'ACTIVE',
-                                                   'availability_zone': zone})
+        servers = inventory.servers(vm_state='ACTIVE', availability_zone=zone)
 
-        projects = cli.list_projects()
-        unlinked_projects = [
-            p.id for p in projects if 'migrate_to' not in p.meta]
+        unlinked_projects = inventory.project_index().unlinked
 
         result_servers = []
 
@@ -1333,51 +1098,33 @@ class UnlinkedCollector(Collector):
 class SubnetCsvCollector(Collector):
     def get_resources(self, env, subnet, zone, csv_output):
         cli = self._get_client(env)
+        inventory = self._get_inventory(env)
         if zone:
-            servers = cli.list_servers(
-                all_projects=True, bare=True, filters={
-                    'limit': 1000,
-                    'vm_state': 'ACTIVE',
-                    'availability_zone': zone
-                })
+            servers = inventory.servers(vm_state='ACTIVE', availability_zone=zone)
         else:
             print("No zone selected! Including all availability zones!")
-            servers = cli.list_servers(
-                all_projects=True, bare=True, filters={
-                    'limit': 1000,
-                    'vm_state': 'ACTIVE'
-                })
-
-        try:
-            projects = cli.list_projects()
-        except JSONDecodeError:
-            # This likes to error randomly in phx_private
-            sleep(10)
-            projects = cli.list_projects()
+            servers = inventory.servers(vm_state='ACTIVE')
+
+        project_index = inventory.project_index()
 
         def get_dst_project(server, dst_projects):
             dst_project = None
+            dst_project_unsafe = None
             if server['metadata'].get('migrate_to'):
                 dst_project_unsafe = server['metadata'].get('migrate_to')
             else:
-                project = [p for p in projects if p.id == server.project_id]
-                project = project[0] if project else None
-                try:
-                    dst_project_unsafe = project.get('meta').get('migrate_to')
-                except AttributeError:
-                    pass
+                project = project_index.get(server.project_id)
+                if project is not None:
+                    dst_project_unsafe = project_meta(project).get('migrate_to')
 
             if dst_project_unsafe:
                 if dst_project_unsafe == 'do_not_migrate':
                     return {'id': 'do_not_migrate', 'name': 'do_not_migrate'}
-                dst_project = [
-                    p for p in dst_projects if p.id == dst_project_unsafe]
-                if not dst_project:
-                    dst_project = [
-                        p for p in dst_projects if p.name == dst_project_unsafe]
+                # Matching the destination project by ID first, then by name
+                dst_project = dst_projects.find(dst_project_unsafe)
 
             if dst_project:
-                return dst_project[0]
+                return dst_project
             else:
                 return {'id': 'invalid', 'name': dst_project_unsafe}
 
@@ -1404,11 +1151,14 @@ class SubnetCsvCollector(Collector):
             except Exception:
                 return "Failed"
 
-        def get_floating_ips(server):
-            fips = []
-            for port in cli.list_ports({'device_id': server.id}):
-                for fip in cli.list_floating_ips({'port_id': port.id}):
-                    fips.append(fip.floating_ip_address)
+        def get_port_index(subnet):
+            # Only the ports with an address on the subnet are listed, in a single request
+            subnet_ports = cli.list_ports({'fixed_ips': f"subnet_id={subnet.id}"})
+            # The floating IPs are listed once for the whole cloud and joined with the ports locally
+            return PortIndex(subnet_ports, inventory.floating_ips())
+
+        def get_floating_ips(server, port_index):
+            fips = port_index.floating_ips(server.id)
             if len(fips) > 0:
                 # Can't use comma here in a CSV. Semicolon and decimal also used in some regions.
                 return '-'.join(fips)
@@ -1416,20 +1166,15 @@ class SubnetCsvCollector(Collector):
                 return ''
 
         def get_dst_projects(env):
-            cloud_map = {
-                'iad_private': 'iad_osng',
-                'phx_private': 'phx_osng',
-                'sin_private': 'sin_osng',
-                'phx_understage': 'phx_nxt_2'
-            }
             # Getting destination cloud data
-            dst_cli = self._get_client(cloud_map[env])
-            # Getting destination cloud projects
-            dst_projects = dst_cli.list_projects()
-            return dst_projects
+            dst_inventory = self._get_inventory(migration_clouds[env])
+            # Getting destination cloud projects indexed by ID and name
+            return dst_inventory.project_index()
 
         def generate_output(stdout):
             subnet = get_subnet()
+            subnet_network = ipaddress.ip_network(subnet.cidr)
+            port_index = get_port_index(subnet)
             table_data = []
             dst_projects = get_dst_projects(env)
 
@@ -1445,7 +1190,7 @@ class SubnetCsvCollector(Collector):
                     for address in instance.addresses.values():
                         for address_detail in address:
                             ip = address_detail['addr']
-                            if ipaddress.ip_address(ip) in ipaddress.ip_network(subnet.cidr):
+                            if ipaddress.ip_address(ip) in subnet_network:
                                 dst_project = get_dst_project(
                                     instance, dst_projects)
                                 row = {
@@ -1454,7 +1199,7 @@ class SubnetCsvCollector(Collector):
                                     'vm.project_id': instance.project_id,
                                     'dst_project': dst_project['id'],
                                     'dst_project_name': dst_project['name'],
-                                    'fip': get_floating_ips(instance),
+                                    'fip': get_floating_ips(instance, port_index),
                                     'initial_ping': get_initial_ping(ip)
                                 }
                                 writer.writerow(row)
@@ -1469,20 +1214,35 @@ class SubnetCsvCollector(Collector):
 
 
 class AllCollector(Collector):
-    def get_resources(self, which, usage):
+    # Listings each report reads on the collected cloud and on the cloud its VMs are migrated to
+    listings = {
+        'subnets': (['subnets', 'servers', 'networks', 'projects'], ['servers']),
+        'risky': (['hypervisors'], []),
+        'hypervisors': (['hypervisors'], []),
+        'vms_per_subnet': (['subnets', 'servers', 'networks'], []),
+        'vms_per_hv': (['hypervisors', 'servers', 'flavors'], []),
+        'projects': (['servers', 'projects'], []),
+        'empty_projects': (['servers', 'projects'], []),
+        'project_validate': ([], ['projects']),
+        'multifips': (['servers', 'projects', 'ports', 'floating_ips'], []),
+        'zones': (['subnets', 'servers', 'projects'], ['servers']),
+        'combined_zones': (['servers', 'projects'], ['servers'])
+    }
+
+    def get_resources(self, which, usage, workers=None):
 
         type = {
-            'subnets': SubnetCollector(),
-            'risky': HighRiskCollector(),
-            'hypervisors': HypervisorCollector(),
-            'vms_per_subnet': VMsPerSubnetCollector(),
-            'vms_per_hv': VMsPerHypervisorCollector(),
-            'projects': ProjectCollector(),
-            'empty_projects': EmptyProjectCollector(),
-            'project_validate': ProjectValidator(),
-            'multifips': VMsWithMultipleFipsCollector(),
-            'zones': ZoneCollector(),
-            'combined_zones': CombinedZoneCollector()
+            'subnets': SubnetCollector(self.inventory),
+            'risky': HighRiskCollector(self.inventory),
+            'hypervisors': HypervisorCollector(self.inventory),
+            'vms_per_subnet': VMsPerSubnetCollector(self.inventory),
+            'vms_per_hv': VMsPerHypervisorCollector(self.inventory),
+            'projects': ProjectCollector(self.inventory),
+            'empty_projects': EmptyProjectCollector(self.inventory),
+            'project_validate': ProjectValidator(self.inventory),
+            'multifips': VMsWithMultipleFipsCollector(self.inventory),
+            'zones': ZoneCollector(self.inventory),
+            'combined_zones': CombinedZoneCollector(self.inventory)
         }
 
         collector_type = type[which]
@@ -1494,13 +1254,22 @@ class AllCollector(Collector):
         # start = dt - timedelta(days=dt.weekday())
         # end = start + timedelta(days=6
 
-        json_data = []
-        for cloud in clouds:
+        def collect(cloud):
             if which == 'subnets':
-                json_data.append(
-                    collector_type.get_resources(cloud, usage, True))
+                return collector_type.get_resources(cloud, usage, True)
             else:
-                json_data.append(collector_type.get_resources(cloud, True))
+                return collector_type.get_resources(cloud, True)
+
+        # Fetching the listings of all clouds at the same time
+        listings = {}
+        source, destination = self.listings[which]
+        for cloud in clouds:
+            listings.setdefault(cloud, []).extend(source)
+            listings.setdefault(migration_clouds[cloud], []).extend(destination)
+        self.inventory.prefetch({cloud: names for cloud, names in listings.items() if names}, workers)
+
+        # The reports probe the hypervisors with Ansible, whose workers can only be forked from the main thread
+        json_data = [collect(cloud) for cloud in clouds]
 
         current_date_obj = {str(today): json_data}
         current_date_json = json.dumps(
@@ -1508,18 +1277,44 @@ class AllCollector(Collector):
         print((current_date_json))
 
 
-# Function to remove the usage output into integer (used for sorting purposes)
-def format_disk_usage(real_usage):
-    if real_usage is not None:
-        if "M" in real_usage:
-            real_usage = round(int(real_usage.replace('M', "")) / 1024, 2)
-        elif 'G' in real_usage:
-            real_usage = int(float(real_usage.replace('G', "")))
-        else:
-            real_usage = 0
+# Function to probe every VM disk usage on the hypervisors of all given subnets in one sweep
+def subnets_disk_usage(inventory, result_subnets):
+    subnets_hvs = {hv for subnet in result_subnets.values()
+                   for hv in subnet['hvs'] if hv is not None}
+    if len(subnets_hvs) == 0:
+        return {}
+    return inventory.vm_disk_usage(sorted(subnets_hvs))
+
+
+# Function to print a disk usage in bytes the way du -h does, e.g. 940M or 17G
+def format_size(size):
+    for unit in ['B', 'K', 'M', 'G']:
+        if size < 1024:
+            break
+        size /= 1024
     else:
-        real_usage = 0
-    return real_usage
+        unit = 'T'
+    if unit != 'B' and size < 10:
+        return f"{round(size, 1)}{unit}"
+    return f"{round(size)}{unit}"
+
+
+# Function to get the percentage of the flavor disk (in GB) used by a disk usage in bytes
+def disk_use_percentage(size, flavor_disk, ndigits):
+    # Boot from volume flavors have no local disk
+    if not flavor_disk:
+        return 0
+    return round(size / (flavor_disk * GIB) * 100, ndigits)
+
+
+# Argument type accepting either a number of forks or 'auto'
+def forks_type(value):
+    if value == 'auto':
+        return value
+    try:
+        return int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid forks value: '{value}'")
 
 
 def main():
@@ -1594,6 +1389,64 @@ def main():
                         help='Write to stdout',
                         action='store_true',
                         dest='stdout', default=False)
+    parser.add_argument('--max-age',
+                        help='Reuse cached OpenStack listings younger than the provided number of seconds',
+                        action='store',
+                        type=int,
+                        dest='max_age')
+    parser.add_argument('--usage-max-age',
+                        help='Reuse cached VM disk usage of hypervisors probed less than the provided number of seconds ago',
+                        action='store',
+                        type=int,
+                        dest='usage_max_age')
+    parser.add_argument('--forks',
+                        help="Number of hypervisors probed at the same time, or 'auto' to scale with the number of hypervisors",
+                        action='store',
+                        type=forks_type,
+                        default=DEFAULT_FORKS,
+                        dest='forks')
+    parser.add_argument('--host-timeout',
+                        help='Seconds after which a probe still running on a hypervisor is killed',
+                        action='store',
+                        type=int,
+                        dest='host_timeout')
+    parser.add_argument('--deadline',
+                        help='Seconds after which no more hypervisors are probed and partial results are returned',
+                        action='store',
+                        type=int,
+                        dest='deadline')
+    parser.add_argument('--ssh-persist',
+                        help='Seconds to keep the SSH connections to the hypervisors open for the next probes, also enables pipelining',
+                        action='store',
+                        type=int,
+                        dest='ssh_persist')
+    parser.add_argument('--precheck',
+                        help='Skip hypervisors not accepting SSH connections within the provided number of seconds, 2 by default',
+                        action='store',
+                        nargs='?',
+                        type=float,
+                        const=PRECHECK_TIMEOUT,
+                        dest='precheck')
+    parser.add_argument('--slice-size',
+                        help='Probe the hypervisors in slices of the provided size, reporting the progress after each slice',
+                        action='store',
+                        type=int,
+                        dest='slice_size')
+    parser.add_argument('--workers',
+                        help='Number of clouds whose listings are fetched at the same time by the all collector',
+                        action='store',
+                        type=int,
+                        dest='workers')
+    parser.add_argument('--combined-probe',
+                        help='Collect the VM disk usage and the health of a hypervisor in a single probe shared by all reports',
+                        action='store_true',
+                        dest='combined_probe', default=False)
+    parser.add_argument('--usage-backend',
+                        help="How the VM disk usage is measured: 'du' walks every instance directory, 'stat' sums the allocated blocks of the instance files",
+                        action='store',
+                        choices=USAGE_BACKENDS,
+                        default=DEFAULT_USAGE_BACKEND,
+                        dest='usage_backend')
 
     args = parser.parse_args()
 
@@ -1602,52 +1455,66 @@ def main():
             # With the verbose option on full output will be show and stored in the "collector.log" file
             debug=True, path='collector.log', stream=sys.stdout)
 
+    # All collectors of this run share one snapshot of every cloud listing
+    inventory = Inventory(cache=ListingCache(), max_age=args.max_age,
+                          usage_cache=DiskUsageCache(), usage_max_age=args.usage_max_age,
+                          probe_options={'forks': args.forks,
+                                         'host_timeout': args.host_timeout,
+                                         'deadline': args.deadline,
+                                         'ssh_persist': args.ssh_persist,
+                                         'precheck': args.precheck,
+                                         'slice_size': args.slice_size},
+                          combined_probe=args.combined_probe, usage_backend=args.usage_backend)
+
     # Defying dictionary with the possible collectors and their filters
     collectors = {
-        'servers': {'type': ServerCollector(),
+        'servers': {'type': ServerCollector(inventory),
                     'filters': [
             args.env, args.sorter or 'usage', args.hours or 24, args.bigger or 0]},
-        'hypervisors': {'type': HypervisorCollector(),
+        'hypervisors': {'type': HypervisorCollector(inventory),
                         'filters': [args.env, args.json_output]},
-        'risky': {'type': HighRiskCollector(),
+        'risky': {'type': HighRiskCollector(inventory),
                   'filters': [args.env, args.json_output]},
-        'subnets': {'type': SubnetCollector(),
+        'subnets': {'type': SubnetCollector(inventory),
                     'filters': [args.env, args.usage, args.json_output]},
-        'vmpersub': {'type': VMsPerSubnetCollector(),
+        'vmpersub': {'type': VMsPerSubnetCollector(inventory),
                      'filters': [args.env, args.json_output]},
-        'vmperhv': {'type': VMsPerHypervisorCollector(),
+        'vmperhv': {'type': VMsPerHypervisorCollector(inventory),
                     'filters': [args.env, args.json_output]},
-        'projects': {'type': ProjectCollector(),
+        'projects': {'type': ProjectCollector(inventory),
                      'filters': [args.env, args.json_output]},
-        'empty_projects': {'type': EmptyProjectCollector(),
+        'empty_projects': {'type': EmptyProjectCollector(inventory),
                            'filters': [args.env, args.json_output]},
-        'empty_hvs': {'type': EmptyHypervisorCollector(),
+        'empty_hvs': {'type': EmptyHypervisorCollector(inventory),
                       'filters': [args.env, args.json_output]},
-        'project_validate': {'type': ProjectValidator(),
+        'project_validate': {'type': ProjectValidator(inventory),
                              'filters': [args.env, args.json_output]},
-        'multifips': {'type': VMsWithMultipleFipsCollector(),
+        'multifips': {'type': VMsWithMultipleFipsCollector(inventory),
                       'filters': [args.env, args.json_output]},
-        'migrated_oh': {'type': MigratedOHVMSCollector(),
+        'migrated_oh': {'type': MigratedOHVMSCollector(inventory),
                         'filters': [args.env]},
-        'group': {'type': OwningGroupCollector(),
+        'group': {'type': OwningGroupCollector(inventory),
                   'filters': [args.env, args.group]},
-        'zones': {'type': ZoneCollector(),
+        'zones': {'type': ZoneCollector(inventory),
                   'filters': [args.env, args.json_output]},
-        'unlinked': {'type': UnlinkedCollector(),
+        'unlinked': {'type': UnlinkedCollector(inventory),
                      'filters': [args.env, args.zone]},
-        'combined_zones': {'type': CombinedZoneCollector(),
+        'combined_zones': {'type': CombinedZoneCollector(inventory),
                            'filters': [args.env, args.json_output]},
-        'csvsubnet': {'type': SubnetCsvCollector(),
+        'csvsubnet': {'type': SubnetCsvCollector(inventory),
                       'filters': [args.env, args.subnet,
                                   args.zone, args.stdout]},
-        'all': {'type': AllCollector(), 'filters': [args.which, args.usage]}
+        'all': {'type': AllCollector(inventory), 'filters': [args.which, args.usage, args.workers]}
     }
 
     # Creating a new collector depending on the provided type
     collector = collectors[args.collector]['type']
     # Adding the filters for that particular collector
     filters = (collectors[args.collector]['filters'])
-    collector.get_resources(*list(filters))
+    try:
+        collector.get_resources(*list(filters))
+    finally:
+        inventory.close()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,7 @@
+#!/usr/bin/env python
+
+import os
+import sys
+
+# The collector modules import each other by their bare names, the way they are run as scripts
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
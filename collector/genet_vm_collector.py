@@ -2,11 +2,11 @@
 
 import argparse
 import csv
-import ipaddress
 import openstack
 import csv
 import neutronclient.v2_0.client as neutronclient
 import openstackclient
+from indexes import ProjectIndex, SubnetIndex
 
 # List of clouds to be used by the script
 clouds = ['ams_private', 'iad_private', 'phx_private', 'sin_private']
@@ -25,30 +25,26 @@ def parse_args(args=None):
     return parser.parse_args(args)
 
 
-def check_migrate_to(server, projects):
-    vm_project_id = server.project_id
+def check_migrate_to(server, project_index):
+    vm_project = project_index.get(server.project_id)
 
-    vm_project = [p for p in projects if p.id == vm_project_id][0]
-
-    if 'migrate_to' in vm_project.meta and vm_project.meta['migrate_to'] != 'do_not_migrate':
+    if vm_project is None:
+        return False
+    if vm_project.id not in project_index.unlinked and vm_project.id not in project_index.do_not_migrate:
         return True
     else: 
         return False
     
 
-def add_servers_to_subnet(servers, cidr, vms, projects):
-    for server in servers:
-        if bool(server.addresses) == True:
-            network_key = list(server.addresses)[0]
-            ip = server.addresses[network_key][0]['addr']
+def add_servers_to_subnet(subnet_servers, vms, project_index):
+    for server in subnet_servers:
+        owning_group = server.metadata.get('owning_group', "")
 
-            owning_group = server.metadata.get('owning_group', "")
-
-            if ipaddress.ip_address(ip) in ipaddress.ip_network(cidr) and check_migrate_to(server, projects):
-                vms.append({'id': server.id,
-                            'name': server.name,
-                            'owning_group':  owning_group,
-                            'migration_dst': server.metadata.get('migration_dst')})
+        if check_migrate_to(server, project_index):
+            vms.append({'id': server.id,
+                        'name': server.name,
+                        'owning_group':  owning_group,
+                        'migration_dst': server.metadata.get('migration_dst')})
 
 
 def generate_csv_file(data):
@@ -81,7 +77,8 @@ def get_vms(cloud):
 
     gen_networks = [n for n in networks if 'gen' in n.name or (cloud == 'sin_private' and 'prd' in n.name)]
 
-    projects = conn.list_projects()
+    # Indexing the projects by ID, the servers are already grouped by subnet
+    project_index = ProjectIndex(conn.list_projects())
 
     gen_subnets = []
     for n in gen_networks:
@@ -91,8 +88,11 @@ def get_vms(cloud):
 
     vms = []
 
+    # Finding the GenNet subnet of every server in a single pass
+    subnet_servers = SubnetIndex([sub.cidr for sub in gen_subnets]).assign(servers)
+
     for sub in gen_subnets:
-        add_servers_to_subnet(servers, sub.cidr, vms, projects)
+        add_servers_to_subnet(subnet_servers.get(sub.cidr, []), vms, project_index)
 
     if len(vms) > 0:
         generate_csv_file(vms)
@@ -0,0 +1,196 @@
+#!/usr/bin/env python
+
+import ipaddress
+from cache import CachedResource
+
+
+def server_ip(server):
+    # Servers are assigned to subnets by the first address of their first network
+    if bool(server.addresses) == True:
+        network_key = list(server.addresses)[0]
+        return server.addresses[network_key][0]['addr']
+    return None
+
+
+def project_meta(project):
+    # Not every project carries the meta attribute
+    return getattr(project, 'meta', None) or {}
+
+
+class SubnetIndex:
+    """Maps IP addresses to the subnets containing them.
+
+    The CIDRs are kept in one hash table per prefix length, so finding the
+    subnets of an address costs one dictionary lookup per prefix length in
+    use instead of building and checking an ip_network for every subnet.
+    """
+
+    def __init__(self, cidrs):
+        tables = {}
+        for cidr in cidrs:
+            network = ipaddress.ip_network(cidr)
+            table = tables.setdefault((network.version, network.prefixlen), {})
+            table[int(network.network_address)] = cidr
+        # Longest prefixes first, so the most specific subnet is always listed first
+        self._tables = sorted(tables.items(), key=lambda t: t[0][1], reverse=True)
+
+    def lookup(self, ip):
+        """Returns the CIDRs of all subnets containing the address."""
+        address = ipaddress.ip_address(ip)
+        value = int(address)
+        cidrs = []
+        for (version, prefixlen), table in self._tables:
+            if version != address.version:
+                continue
+            host_bits = address.max_prefixlen - prefixlen
+            cidr = table.get(value >> host_bits << host_bits)
+            if cidr is not None:
+                cidrs.append(cidr)
+        return cidrs
+
+    def assign(self, servers):
+        """Groups the servers by the CIDRs of the subnets they are on."""
+        subnet_servers = {}
+        for server in servers:
+            ip = server_ip(server)
+            if ip is None:
+                continue
+            for cidr in self.lookup(ip):
+                subnet_servers.setdefault(cidr, []).append(server)
+        return subnet_servers
+
+
+class HypervisorIndex:
+    """Groups the servers by the hypervisor hosting them in a single pass.
+
+    The number of servers and of servers migrated out of each hypervisor
+    (tagged with oh_migration_state) are counted at the same time.
+    """
+
+    def __init__(self, servers):
+        self._servers = {}
+        self._migrated = {}
+        for server in servers:
+            hypervisor = getattr(server, 'hypervisor_hostname', None)
+            self._servers.setdefault(hypervisor, []).append(server)
+            if 'oh_migration_state' in server.metadata:
+                self._migrated[hypervisor] = self._migrated.get(hypervisor, 0) + 1
+
+    def hypervisors(self):
+        return list(self._servers)
+
+    def servers(self, hypervisor):
+        return self._servers.get(hypervisor, [])
+
+    def total(self, hypervisor):
+        return len(self.servers(hypervisor))
+
+    def migrated(self, hypervisor):
+        return self._migrated.get(hypervisor, 0)
+
+    def total_migrated(self):
+        return sum(self._migrated.values())
+
+
+class FlavorIndex:
+    """Resolves the flavor of a server by flavor ID or name.
+
+    Newer Nova microversions embed the flavor data in the server instead of
+    its ID, with the flavor name under original_name. That data is used when
+    the flavor is not in the listing, e.g. because it was deleted.
+    """
+
+    def __init__(self, flavors):
+        self._flavors = {}
+        for flavor in flavors:
+            self._flavors.setdefault(flavor.name, flavor)
+        # IDs win over names, the same way the listing was searched before
+        for flavor in flavors:
+            self._flavors[flavor.id] = flavor
+
+    def get(self, server):
+        flavor = server.flavor
+        flavor_id = getattr(flavor, 'id', None)
+        name = getattr(flavor, 'original_name', None)
+        for key in [flavor_id, name]:
+            if key is not None and key in self._flavors:
+                return self._flavors[key]
+        # Deleted flavor, described only by the data embedded in the server
+        return CachedResource(
+            id=flavor_id, name=name or f"{flavor_id} (deleted)",
+            disk=getattr(flavor, 'disk', None) or 0,
+            ram=getattr(flavor, 'ram', None) or 0,
+            vcpus=getattr(flavor, 'vcpus', None) or 0)
+
+
+class ProjectIndex:
+    """Projects keyed by ID, with their servers grouped by project_id.
+
+    The IDs of the do_not_migrate projects and of the projects without the
+    migrate_to metadata (unlinked) are kept in sets. The servers are only
+    listed and grouped the first time a project is asked for its servers.
+    """
+
+    def __init__(self, projects, load_servers=None):
+        self._projects = {}
+        self._names = {}
+        self.do_not_migrate = set()
+        self.unlinked = set()
+        for project in projects:
+            self._projects[project.id] = project
+            self._names.setdefault(project.name, project)
+            meta = project_meta(project)
+            migrate_to = meta.get('migrate_to')
+            if 'migrate_to' not in meta:
+                self.unlinked.add(project.id)
+            elif migrate_to == 'do_not_migrate':
+                self.do_not_migrate.add(project.id)
+        self._load_servers = load_servers
+        self._servers = None
+
+    def projects(self):
+        return list(self._projects.values())
+
+    def get(self, project_id):
+        return self._projects.get(project_id)
+
+    def find(self, id_or_name):
+        """Returns the project with the given ID, or else with the given name."""
+        project = self._projects.get(id_or_name)
+        if project is None:
+            project = self._names.get(id_or_name)
+        return project
+
+    def servers(self, project_id):
+        if self._servers is None:
+            servers = {}
+            for server in self._load_servers():
+                servers.setdefault(server.project_id, []).append(server)
+            self._servers = servers
+        return self._servers.get(project_id, [])
+
+
+class PortIndex:
+    """Joins the ports of the servers with their floating IPs.
+
+    The ports are grouped by device_id and the floating IPs by port_id in a
+    single pass over each listing, so the floating IPs of a server are found
+    with two dictionary lookups.
+    """
+
+    def __init__(self, ports, floating_ips):
+        self._ports = {}
+        for port in ports:
+            self._ports.setdefault(port['device_id'], []).append(port)
+        self._floating_ips = {}
+        for fip in floating_ips:
+            self._floating_ips.setdefault(fip['port_id'], []).append(fip)
+
+    def ports(self, device_id):
+        return self._ports.get(device_id, [])
+
+    def floating_ips(self, device_id):
+        """Returns the floating IP addresses of all the ports of the device."""
+        return [fip.floating_ip_address
+                for port in self.ports(device_id)
+                for fip in self._floating_ips.get(port.id, [])]
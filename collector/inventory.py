@@ -0,0 +1,313 @@
+#!/usr/bin/env python
+
+from concurrent.futures import ThreadPoolExecutor
+import openstack
+from requests.exceptions import JSONDecodeError
+import sys
+import threading
+from time import sleep
+from indexes import FlavorIndex, HypervisorIndex, PortIndex, ProjectIndex
+from usage import ProbeExecutor, SweepResult, DEFAULT_USAGE_BACKEND
+
+# Maximum number of API listings running at the same time against one cloud
+API_CONCURRENCY = 4
+
+
+class CloudInventory:
+    """Snapshot of the OpenStack listings of a single cloud.
+
+    Each resource type is listed the first time a collector asks for it and
+    the same list is handed to every other collector for the rest of the run.
+    When a cache and max_age are provided, listings younger than max_age
+    seconds are read from it instead of the API and every fresh listing is
+    written back to it.
+    The same applies to the VM disk usage probed on each hypervisor with the
+    usage cache and usage_max_age. Hypervisors are probed with probe_executor,
+    or a ProbeExecutor with the default options when none is given. With
+    combined_probe, the disk usage and the health of a hypervisor are
+    collected together the first time either is needed and shared by every
+    report for the rest of the run.
+    usage_backend selects how the disk usage of the VMs is measured.
+    """
+
+    def __init__(self, cloud, cache=None, max_age=None, concurrency=API_CONCURRENCY,
+                 usage_cache=None, usage_max_age=None, probe_executor=None, combined_probe=False,
+                 usage_backend=DEFAULT_USAGE_BACKEND):
+        self.cloud = cloud
+        self.cache = cache
+        self.max_age = max_age
+        self.usage_cache = usage_cache
+        self.usage_max_age = usage_max_age
+        self.probe_executor = probe_executor or ProbeExecutor()
+        self.combined_probe = combined_probe
+        self.usage_backend = usage_backend
+        self._client = None
+        self._resources = {}
+        self._indexes = {}
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._api_slots = threading.BoundedSemaphore(concurrency)
+        self._sweep = SweepResult()
+        self._swept = set()
+        self._sweep_lock = threading.Lock()
+
+    @property
+    def client(self):
+        # Connecting lazily so clouds we never query are never authenticated against
+        with self._lock:
+            if self._client is None:
+                self._client = openstack.connect(cloud=self.cloud)
+            return self._client
+
+    def _load(self, key, loader):
+        # A listing requested by two threads at once is only fetched by the first one
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            if key not in self._resources:
+                resources = None
+                # The cache is only read and written when max_age is given
+                use_cache = self.cache is not None and self.max_age is not None
+                if use_cache:
+                    resources = self.cache.get(self.cloud, key, self.max_age)
+                if resources is None:
+                    with self._api_slots:
+                        resources = loader()
+                    if use_cache:
+                        self.cache.put(self.cloud, key, resources)
+                self._resources[key] = resources
+        return self._resources[key]
+
+    def prefetch(self, *names):
+        """Loads the given listings concurrently, e.g. prefetch('servers', 'subnets')."""
+        with ThreadPoolExecutor(max_workers=len(names)) as executor:
+            futures = [executor.submit(getattr(self, name)) for name in names]
+        # Re-raising the first error of any listing
+        for future in futures:
+            future.result()
+
+    def servers(self, **filters):
+        filters = {'limit': 1000, **filters}
+        key = 'servers'
+        # Filtered listings are kept apart from the full fleet listing
+        if len(filters) > 1:
+            key += ':' + ','.join(f"{k}={v}" for k, v in sorted(filters.items()))
+        return self._load(key, lambda: self.client.list_servers(
+            all_projects=True, bare=True, filters=filters))
+
+    def projects(self):
+        def list_projects():
+            try:
+                return self.client.list_projects()
+            except JSONDecodeError:
+                # This likes to error randomly in phx_private
+                print(f"Error listing projects from cloud {self.cloud} - trying one more time.")
+                sleep(10)
+                return self.client.list_projects()
+        return self._load('projects', list_projects)
+
+    def subnets(self):
+        return self._load('subnets', lambda: self.client.list_subnets())
+
+    def networks(self):
+        return self._load('networks', lambda: self.client.list_networks())
+
+    def flavors(self):
+        return self._load('flavors', lambda: self.client.list_flavors())
+
+    def hypervisors(self):
+        return self._load('hypervisors', lambda: self.client.list_hypervisors())
+
+    def ports(self):
+        return self._load('ports', lambda: self.client.list_ports())
+
+    def floating_ips(self):
+        return self._load('floating_ips', lambda: self.client.list_floating_ips())
+
+    def _index(self, key, build):
+        # Indexes are built once from the listings and shared by every collector
+        with self._lock:
+            key_lock = self._key_locks.setdefault(f"index:{key}", threading.Lock())
+        with key_lock:
+            if key not in self._indexes:
+                self._indexes[key] = build()
+        return self._indexes[key]
+
+    def flavor_index(self):
+        return self._index('flavors', lambda: FlavorIndex(self.flavors()))
+
+    def hypervisor_index(self):
+        return self._index('hypervisors', lambda: HypervisorIndex(self.servers()))
+
+    def project_index(self):
+        # The servers are only listed if a collector asks for the servers of a project
+        return self._index('projects', lambda: ProjectIndex(self.projects(), self.servers))
+
+    def port_index(self):
+        return self._index('ports', lambda: PortIndex(self.ports(), self.floating_ips()))
+
+    def migration_targets(self):
+        # Servers of a destination cloud that were created by a migration
+        return [s for s in self.servers() if 'migration_src' in s.metadata.keys()]
+
+    def vm_disk_usage(self, hypervisors=None, consumer=None, vm_ids=None):
+        """Returns the disk usage of every VM on the given hypervisors.
+
+        Only hypervisors without a usable cached probe are probed again.
+        consumer, if given, is called with each hypervisor and its VMs disk
+        usage as soon as they are known, cached hypervisors first. With
+        vm_ids, only the hypervisors hosting those VMs are probed and only the
+        disks of those VMs are sized.
+        """
+        # VMs the server listing places on each hypervisor
+        hypervisor_index = self.hypervisor_index()
+        hypervisors_vms = {}
+        for hv in hypervisor_index.hypervisors():
+            hypervisors_vms[hv] = {server.id for server in hypervisor_index.servers(hv)}
+
+        targets = None
+        if vm_ids is not None:
+            vm_ids = set(vm_ids)
+            targets = {hv: vms & vm_ids for hv, vms in hypervisors_vms.items()
+                       if hv is not None and (hypervisors is None or hv in hypervisors) and vms & vm_ids}
+            hypervisors = sorted(targets)
+
+        disk_usage = SweepResult()
+        stale_hypervisors = []
+        for hv in hypervisors:
+            cached = None
+            if self.usage_cache is not None and self.usage_max_age:
+                cached = self.usage_cache.get(self.cloud, hv, self.usage_backend, self.usage_max_age,
+                                              hypervisors_vms.get(hv, set()))
+            if cached is None:
+                stale_hypervisors.append(hv)
+            else:
+                disk_usage.update(cached)
+                if consumer is not None:
+                    consumer(hv, cached)
+
+        def on_probed(hv, hv_disk_usage):
+            # Called by the probe as each hypervisor answers
+            disk_usage.update(hv_disk_usage)
+            # A targeted probe does not size every VM of the hypervisor
+            if self.usage_cache is not None and targets is None:
+                self.usage_cache.put(self.cloud, hv, self.usage_backend, hypervisors_vms.get(hv, set()), hv_disk_usage)
+            if consumer is not None:
+                consumer(hv, hv_disk_usage)
+
+        if len(stale_hypervisors) > 0:
+            if targets is not None:
+                probed = self.probe_executor.vm_disk_usage_by_host(
+                    stale_hypervisors, on_probed, self.usage_backend,
+                    targets={hv: targets[hv] for hv in stale_hypervisors}, keep_results=False)
+                self._report_sweep('disk usage', probed)
+            elif self.combined_probe:
+                probed = self.hypervisor_sweep(
+                    stale_hypervisors, consumer=lambda hv, record: on_probed(hv, record['vms']))
+            else:
+                # on_probed keeps the usage, the probe only has to report the hosts left out
+                probed = self.probe_executor.vm_disk_usage_by_host(stale_hypervisors, on_probed, self.usage_backend,
+                                                                   keep_results=False)
+                self._report_sweep('disk usage', probed)
+            disk_usage.copy_status(probed)
+        return disk_usage
+
+    def hypervisors_health(self, hypervisors):
+        # Disk, ram usage and raid puncture errors of every hypervisor
+        if self.combined_probe:
+            consumer = None
+            if self.usage_cache is not None:
+                hypervisor_index = self.hypervisor_index()
+
+                def consumer(hv, record):
+                    # Keeping the disk usage of the sweep for later runs, the same way vm_disk_usage does
+                    vm_ids = {server.id for server in hypervisor_index.servers(hv)}
+                    self.usage_cache.put(self.cloud, hv, self.usage_backend, vm_ids, record['vms'])
+            return self.hypervisor_sweep(hypervisors, consumer)
+        health = self.probe_executor.high_risk_hv(hypervisors)
+        self._report_sweep('health', health)
+        return health
+
+    def hypervisor_sweep(self, hypervisors, consumer=None):
+        """Returns the combined disk usage and health probe of the given hypervisors.
+
+        Each hypervisor is probed at most once, later calls get the same
+        records. consumer is called with each hypervisor and its record.
+        """
+        # Holding the lock for the whole probe so no hypervisor is probed twice
+        with self._sweep_lock:
+            for hv in hypervisors:
+                if consumer is not None and hv in self._sweep:
+                    consumer(hv, self._sweep[hv])
+            pending = [hv for hv in hypervisors if hv not in self._swept]
+            if len(pending) > 0:
+                probed = self.probe_executor.hypervisor_probe(pending, consumer, self.usage_backend)
+                self._sweep.update(probed)
+                self._sweep.copy_status(probed)
+                self._swept.update(pending)
+                self._report_sweep('hypervisor', probed)
+
+        sweep = SweepResult({hv: self._sweep[hv] for hv in hypervisors if hv in self._sweep})
+        for status, sweep_status in [(sweep.unreachable, self._sweep.unreachable),
+                                     (sweep.failed, self._sweep.failed),
+                                     (sweep.timed_out, self._sweep.timed_out)]:
+            status.update({hv: sweep_status[hv] for hv in hypervisors if hv in sweep_status})
+        return sweep
+
+    def _report_sweep(self, name, sweep_result):
+        summary = sweep_result.summary()
+        if summary:
+            # Writing to stderr so the JSON output stays valid
+            print(f"Incomplete {name} sweep on {self.cloud} - {summary}", file=sys.stderr)
+
+
+class Inventory:
+    """Per-run collection of cloud snapshots, keyed by cloud name."""
+
+    def __init__(self, cache=None, max_age=None, usage_cache=None, usage_max_age=None,
+                 probe_options=None, combined_probe=False, usage_backend=DEFAULT_USAGE_BACKEND):
+        self.cache = cache
+        self.max_age = max_age
+        self.usage_cache = usage_cache
+        self.usage_max_age = usage_max_age
+        # One probe executor is shared by every cloud, created the first time a cloud is used
+        self.probe_options = probe_options or {}
+        self._probe_executor = None
+        self.combined_probe = combined_probe
+        self.usage_backend = usage_backend
+        self._clouds = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, cloud):
+        # The listings of different clouds are prefetched in parallel threads
+        with self._lock:
+            if cloud not in self._clouds:
+                self._clouds[cloud] = CloudInventory(
+                    cloud, self.cache, self.max_age,
+                    usage_cache=self.usage_cache, usage_max_age=self.usage_max_age,
+                    probe_executor=self._get_probe_executor(), combined_probe=self.combined_probe,
+                    usage_backend=self.usage_backend)
+            return self._clouds[cloud]
+
+    def _get_probe_executor(self):
+        # Called with the lock held
+        if self._probe_executor is None:
+            self._probe_executor = ProbeExecutor(**self.probe_options)
+        return self._probe_executor
+
+    def close(self):
+        """Releases the probe executor, the inventory can not probe hypervisors afterwards."""
+        with self._lock:
+            if self._probe_executor is not None:
+                self._probe_executor.close()
+
+    def prefetch(self, listings, workers=None):
+        """Loads the listings of several clouds concurrently, at most workers clouds at a time.
+
+        e.g. prefetch({'phx_private': ['servers', 'projects'], 'phx_osng': ['servers']})
+        """
+        with ThreadPoolExecutor(max_workers=workers or len(listings)) as executor:
+            futures = [executor.submit(self[cloud].prefetch, *names)
+                       for cloud, names in listings.items()]
+        for future in futures:
+            future.result()
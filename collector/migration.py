@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+
+
+class MigrationCounters:
+    """Migration progress of a group of VMs."""
+
+    def __init__(self):
+        self.count = 0
+        self.active = 0
+        self.migrated_active = 0
+        self.migrated_inactive = 0
+        self.do_not_migrate = 0
+        self.unlinked = 0
+        # Active VMs that still have to be migrated
+        self.to_be_migrated_vms = []
+
+    @property
+    def to_be_migrated(self):
+        return len(self.to_be_migrated_vms)
+
+
+class MigrationClassifier:
+    """Classifies VMs by their migration state.
+
+    The do_not_migrate and unlinked project IDs and the IDs of the migrated
+    servers on the destination cloud are kept in sets, so any grouping of
+    the VMs is counted in a single pass with constant time lookups.
+    """
+
+    def __init__(self, project_index, dest_servers):
+        # Projects that have "do_not_migrate" tag
+        self.do_not_migrate_projects = project_index.do_not_migrate
+        # Projects that don't have the migrate_to metadata
+        self.unlinked_projects = project_index.unlinked
+        # Destination VMs that contain migration metadata
+        self.dest_server_ids = {s.id for s in dest_servers}
+
+    def is_migrated(self, vm):
+        return "migration_dst" in vm.metadata.keys() and vm.metadata['migration_dst'] in self.dest_server_ids
+
+    def classify(self, servers, key):
+        """Returns the MigrationCounters of the servers grouped by key(server)."""
+        groups = {}
+        for vm in servers:
+            group = key(vm)
+            counters = groups.get(group)
+            if counters is None:
+                counters = groups[group] = MigrationCounters()
+            self._count(counters, vm)
+        return groups
+
+    def summarize(self, servers):
+        """Returns the MigrationCounters of all the servers as one group."""
+        counters = MigrationCounters()
+        for vm in servers:
+            self._count(counters, vm)
+        return counters
+
+    def _count(self, counters, vm):
+        counters.count += 1
+        migrated = self.is_migrated(vm)
+        if vm.status == 'ACTIVE':
+            counters.active += 1
+            if migrated:
+                counters.migrated_active += 1
+            if vm.project_id in self.do_not_migrate_projects:
+                counters.do_not_migrate += 1
+            elif vm.project_id in self.unlinked_projects:
+                counters.unlinked += 1
+            else:
+                counters.to_be_migrated_vms.append(vm)
+        elif migrated:
+            counters.migrated_inactive += 1
@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+
+import json
+
+from openstack.compute.v2.flavor import Flavor
+from openstack.compute.v2.hypervisor import Hypervisor
+from openstack.compute.v2.server import Server
+from openstack.identity.v3.project import Project
+
+from cache import CachedResource, ListingCache, _to_dicts
+
+
+def round_trip(resource):
+    return json.loads(json.dumps(_to_dicts([resource]), default=str), object_hook=CachedResource)[0]
+
+
+def test_server_round_trip():
+    server = Server(id='vm-id', name='vm', status='ACTIVE', project_id='project-id',
+                    metadata={'migration_dst': 'dst-id'}, hypervisor_hostname='hv1',
+                    availability_zone='az1', addresses={'net': [{'addr': '10.0.0.5'}]},
+                    flavor={'original_name': 'm1.small', 'disk': 20}, config_drive='True')
+    cached = round_trip(server)
+    assert cached.id == 'vm-id'
+    assert cached.name == 'vm'
+    assert cached.status == 'ACTIVE'
+    assert cached.project_id == 'project-id'
+    assert cached.metadata == {'migration_dst': 'dst-id'}
+    assert cached.hypervisor_hostname == 'hv1'
+    assert cached.addresses == {'net': [{'addr': '10.0.0.5'}]}
+    assert cached.flavor['original_name'] == 'm1.small'
+    assert cached.config_drive == 'True'
+    # API names used by the collectors
+    assert cached['OS-EXT-AZ:availability_zone'] == 'az1'
+    assert cached['OS-EXT-SRV-ATTR:hypervisor_hostname'] == 'hv1'
+
+
+def test_project_round_trip():
+    project = Project(id='project-id', name='project', domain_id='default', is_enabled=True)
+    cached = round_trip(project)
+    assert cached.id == 'project-id'
+    assert cached.name == 'project'
+    assert cached.domain_id == 'default'
+    assert cached.is_enabled is True
+    assert cached['enabled'] is True
+
+
+def test_hypervisor_round_trip():
+    hypervisor = Hypervisor(id='hv-id', name='hv1', status='enabled', local_disk_free=100)
+    cached = round_trip(hypervisor)
+    assert cached.id == 'hv-id'
+    assert cached.name == 'hv1'
+    assert cached.status == 'enabled'
+    assert cached.local_disk_free == 100
+    assert cached['hypervisor_hostname'] == 'hv1'
+
+
+def test_flavor_round_trip():
+    flavor = Flavor(id='flavor-id', name='m1.small', disk=20, ram=2048, vcpus=1)
+    cached = round_trip(flavor)
+    assert cached.id == 'flavor-id'
+    assert cached.name == 'm1.small'
+    assert (cached.disk, cached.ram, cached.vcpus) == (20, 2048, 1)
+
+
+def test_listing_cache_round_trip(tmp_path):
+    cache = ListingCache(str(tmp_path / 'listings.sqlite'))
+    cache.put('cloud', 'servers', [Server(id='vm-id', name='vm', project_id='project-id')])
+    cached = cache.get('cloud', 'servers', 60)
+    assert [(s.id, s.name, s.project_id) for s in cached] == [('vm-id', 'vm', 'project-id')]
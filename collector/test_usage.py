@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+
+from concurrent.futures import ThreadPoolExecutor
+import os
+import sys
+
+import pytest
+from ansible.plugins.loader import init_plugin_loader
+
+from usage import (HEALTH_COMMAND, HEALTH_MARKER, TARGETS_VAR, USAGE_BACKENDS, ProbeExecutor,
+                   _parse_disk_usage, _parse_hypervisor, _shell_task, disk_usage_command)
+
+# Running the probe tasks on the local host instead of over SSH
+LOCAL_VARS = {'ansible_connection': 'local', 'ansible_python_interpreter': sys.executable}
+
+
+@pytest.fixture(scope='module', autouse=True)
+def plugin_loader():
+    # Scripts using the Ansible API have to set up the collection loader themselves
+    init_plugin_loader()
+
+
+@pytest.fixture(scope='module')
+def executor():
+    with ProbeExecutor() as executor:
+        yield executor
+
+
+@pytest.fixture
+def instances_dir(tmp_path):
+    # The probe commands cut the VM UUID after "instances/"
+    instances_dir = tmp_path / 'instances'
+    for uuid in ['vm-a', 'vm-b']:
+        os.makedirs(instances_dir / uuid)
+        with open(instances_dir / uuid / 'disk', 'wb') as f:
+            f.write(b'x' * 64 * 1024)
+    return str(instances_dir)
+
+
+@pytest.mark.parametrize('backend', USAGE_BACKENDS)
+def test_disk_usage_task(executor, instances_dir, backend):
+    tasks = [_shell_task(disk_usage_command(backend, [instances_dir]))]
+    result = executor.run(['localhost'], tasks, _parse_disk_usage, host_vars={'localhost': LOCAL_VARS})
+    assert result.failed == {}
+    assert set(result['localhost']) == {'vm-a', 'vm-b'}
+    assert all(usage >= 64 * 1024 for usage in result['localhost'].values())
+
+
+@pytest.mark.parametrize('backend', USAGE_BACKENDS)
+def test_targeted_disk_usage_task(executor, instances_dir, backend):
+    tasks = [_shell_task(disk_usage_command(backend, [instances_dir], targeted=True))]
+    host_vars = {'localhost': dict(LOCAL_VARS, **{TARGETS_VAR: ['vm-b']})}
+    result = executor.run(['localhost'], tasks, _parse_disk_usage, host_vars=host_vars)
+    assert result.failed == {}
+    assert set(result['localhost']) == {'vm-b'}
+
+
+@pytest.mark.parametrize('backend', USAGE_BACKENDS)
+def test_hypervisor_task(executor, instances_dir, backend):
+    tasks = [_shell_task(f"{disk_usage_command(backend, [instances_dir])}; echo '{HEALTH_MARKER}'; {HEALTH_COMMAND}")]
+    result = executor.run(['localhost'], tasks, _parse_hypervisor, host_vars={'localhost': LOCAL_VARS})
+    assert result.failed == {}
+    assert set(result['localhost']['vms']) == {'vm-a', 'vm-b'}
+    assert float(result['localhost']['ram_usage']) > 0
+
+
+def test_targeted_slices(instances_dir):
+    hosts = ['localhost', '127.0.0.1']
+    host_vars = {host: dict(LOCAL_VARS, **{TARGETS_VAR: [uuid]}) for host, uuid in zip(hosts, ['vm-a', 'vm-b'])}
+    tasks = [_shell_task(disk_usage_command('du', [instances_dir], targeted=True))]
+    with ProbeExecutor(slice_size=1) as executor:
+        result = executor.run(hosts, tasks, _parse_disk_usage, host_vars=host_vars)
+    assert result.failed == {}
+    assert {host: set(usage) for host, usage in result.items()} == {'localhost': {'vm-a'}, '127.0.0.1': {'vm-b'}}
+
+
+def test_plays_only_run_from_the_main_thread(executor):
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        future = pool.submit(executor.run, ['localhost'], [_shell_task('true')], host_vars={'localhost': LOCAL_VARS})
+    with pytest.raises(RuntimeError):
+        future.result()
@@ -3,7 +3,16 @@
 from __future__ import (absolute_import, division, print_function)
 __metaclass__ = type
 
+from concurrent.futures import ThreadPoolExecutor
+import functools
+import gc
+import os
+import resource
 import shutil
+import socket
+import sys
+import threading
+import time
 
 import ansible.constants as C
 from ansible.executor.task_queue_manager import TaskQueueManager
@@ -15,186 +24,455 @@ from ansible.plugins.callback import CallbackBase
 from ansible.vars.manager import VariableManager
 from ansible import context
 
+# Number of hosts probed at the same time when no fork count is configured
+DEFAULT_FORKS = 10
+# Upper bound of the fork count picked by the adaptive mode
+MAX_FORKS = 250
+# Directory of the SSH master sockets kept open between probes
+CONTROL_PATH_DIR = os.path.expanduser('~/.ansible/cp')
+# Port checked by the reachability pre-check and seconds to wait for it
+SSH_PORT = 22
+PRECHECK_TIMEOUT = 2
+# Number of hosts checked at the same time by the reachability pre-check
+PRECHECK_WORKERS = 64
+
+# Directories holding the instance directories on containerized and plain nova compute hosts
+INSTANCE_DIRS = ['/var/lib/docker/volumes/nova_compute/_data/instances', '/var/lib/nova/instances']
+# Ways of measuring the disk usage of every instance directory
+USAGE_BACKENDS = ['du', 'stat']
+DEFAULT_USAGE_BACKEND = 'du'
+# Fill of the /mapper disk, RAM usage percentage and number of raid punctures, one "<field> <value>" line each
+HEALTH_COMMAND = ("df -h | awk '/mapper/ {print \"disk_usage\", $5}'; "
+                  "free | awk '/Mem/ {print \"ram_usage\", $3/$2 * 100}'; "
+                  "echo \"raid_punctures $(/opt/MegaRAID/MegaCli/MegaCli -AdpAlILog -aAll | grep Punc | wc -l)\"")
+HEALTH_FIELDS = ['disk_usage', 'ram_usage', 'raid_punctures']
+# Separates the disk usage lines from the health lines in the output of the combined probe
+HEALTH_MARKER = '--- health ---'
+# Host variable listing the VMs to probe on each host with a targeted disk usage command
+TARGETS_VAR = 'probe_uuids'
+
+
+def disk_usage_command(backend=DEFAULT_USAGE_BACKEND, instance_dirs=INSTANCE_DIRS, targeted=False):
+    """Returns the shell command printing "<VM UUID> <KiB>" for every instance directory.
+
+    The du backend walks every instance directory. The stat backend sums the
+    allocated blocks (st_blocks) of the files directly in each instance
+    directory from a single find, which leaves out the few KiB of the
+    directory entries themselves. A targeted command only measures the
+    instance directories of the VM UUIDs in the probe_uuids host variable.
+    """
+    if targeted:
+        # Templated by Ansible with the variables of each host
+        paths = ' '.join(f"{{% for uuid in {TARGETS_VAR} %}}{d}/{{{{ uuid }}}} {{% endfor %}}" for d in instance_dirs)
+    else:
+        paths = ' '.join(f"{d}/*" for d in instance_dirs)
+    if backend == 'du':
+        usage = f"du -sk {paths} 2> /dev/null | awk '{{print $2, $1}}'"
+    elif backend == 'stat':
+        # find prints the allocated size in 512 bytes blocks
+        usage = (f"find {paths} -mindepth 1 -maxdepth 1 -type f -printf '%h %b\\n' 2> /dev/null"
+                 " | awk '{blocks[$1] += $2} END {for (d in blocks) print d, int((blocks[d] + 1) / 2)}'")
+    else:
+        raise ValueError(f"Unknown disk usage backend {backend}, expected one of {', '.join(USAGE_BACKENDS)}")
+    return f"{usage} | grep -vE 'base|locks|nodes|snapshots' | awk -F 'instances/' '{{print$2}}'"
+
+
+def _main_thread_only(func):
+    # The task queue manager forks its workers, and workers forked from other threads die at random
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if threading.current_thread() is not threading.main_thread():
+            raise RuntimeError('Ansible plays can only be run from the main thread')
+        return func(*args, **kwargs)
+    return wrapper
+
+
 # Create a callback plugin so we can capture the output
 class ResultsCollectorJSONCallback(CallbackBase):
-    """A sample callback plugin used for performing an action as results come in.
+    """A callback plugin used for performing an action as results come in.
 
-    If you want to collect all results into a single object for processing at
-    the end of the execution, look into utilizing the ``json`` callback plugin
-    or writing your own custom callback plugin.
+    The output of every host is parsed into a compact record with parse as
+    soon as the host answers, and only that record is kept. When a consumer
+    is given it is called with the host name and the record right away, so
+    results can be used before the whole play is over.
     """
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, parse=None, consumer=None, **kwargs):
         super(ResultsCollectorJSONCallback, self).__init__(*args, **kwargs)
+        self.parse = parse
+        self.consumer = consumer
         self.host_ok = {}
         self.host_unreachable = {}
         self.host_failed = {}
 
     def v2_runner_on_unreachable(self, result):
         host = result._host
-        self.host_unreachable[host.get_name()] = result
+        self.host_unreachable[host.get_name()] = result._result.get('msg', '')
 
     def v2_runner_on_ok(self, result, *args, **kwargs):
-        """Print a json representation of the result.
+        """Parse the result and store the record for retrieval later.
 
-        Also, store the result in an instance attribute for retrieval later
+        The raw TaskResult is dropped so the stdout of every host is not kept
+        in memory until the end of the play.
         """
-        host = result._host
-        self.host_ok[host.get_name()] = result
-        # print(json.dumps({host.name: result._result}, indent=4))
-        # print((result._result['stdout']))
+        host = result._host.get_name()
+        record = result._result.get('stdout_lines', [])
+        # Ansible only warns about errors raised in callbacks, so they are reported as host failures
+        try:
+            if self.parse is not None:
+                record = self.parse(record)
+            self.host_ok[host] = record
+            if self.consumer is not None:
+                self.consumer(host, record)
+        except Exception as e:
+            self.host_ok.pop(host, None)
+            self.host_failed[host] = f"Handling the output failed: {e!r}"
+
     def v2_runner_on_failed(self, result, *args, **kwargs):
         host = result._host
-        self.host_failed[host.get_name()] = result
+        self.host_failed[host.get_name()] = result._result.get('msg', '')
 
 
-def vm_disk_usage(hvs):
-    if isinstance(hvs, list):
-        host_list = hvs
+def _parse_disk_usage(stdout_lines):
+    # Lines are "<VM UUID> <KiB>", the usage is returned in bytes
+    disk_usage = {}
+    for line in stdout_lines:
+        line = line.replace("/var/lib/docker/volumes/nova_compute/_data/instances/", "")
+        line = line.replace("/var/lib/nova/instances/", "")
+        fields = line.split(' ')
+        if len(fields) == 2 and fields[1].isdigit():
+            disk_usage[fields[0]] = int(fields[1]) * 1024
+    return disk_usage
+
+
+def _parse_health(stdout_lines):
+    # Fields missing from the output, e.g. on a host without a /mapper disk, are reported as 0
+    record = {field: '0' for field in HEALTH_FIELDS}
+    # Reading the lines backwards so the first /mapper disk wins
+    for line in reversed(stdout_lines):
+        fields = line.split(' ')
+        if len(fields) == 2 and fields[0] in record:
+            record[fields[0]] = fields[1].replace('%', '')
+    return record
+
+
+def _parse_hypervisor(stdout_lines):
+    # Disk usage lines come first, the health lines follow the marker
+    if HEALTH_MARKER in stdout_lines:
+        marker = stdout_lines.index(HEALTH_MARKER)
     else:
-        host_list = [hvs]
-    # since the API is constructed for CLI it expects certain options to always be set in the context object
-    context.CLIARGS = ImmutableDict(connection='smart', module_path=['/to/mymodules', '/usr/share/ansible'], forks=10, become='yes',
-                                    become_method='sudo', become_flags='-i', become_user=None, check=False, diff=False, verbosity=0)
-    # required for
-    # https://github.com/ansible/ansible/blob/devel/lib/ansible/inventory/manager.py#L204
-    sources = ','.join(host_list)
-    if len(host_list) == 1:
-        sources += ','
-
-    # initialize needed objects
-    loader = DataLoader()  # Takes care of finding and reading yaml, json and ini files
-    passwords = dict(vault_pass='secret')
-
-    # Instantiate our ResultsCollectorJSONCallback for handling results as they come in. Ansible expects this to be one of its main display outlets
-    results_callback = ResultsCollectorJSONCallback()
-
-    # create inventory, use path to host config file as source or hosts in a comma separated string
-    inventory = InventoryManager(loader=loader, sources=sources)
-
-    # variable manager takes care of merging all the different sources to give you a unified view of variables available in each context
-    variable_manager = VariableManager(loader=loader, inventory=inventory)
-
-    # instantiate task queue manager, which takes care of forking and setting up all objects to iterate over host list and tasks
-    # IMPORTANT: This also adds library dirs paths to the module loader
-    # IMPORTANT: and so it must be initialized before calling `Play.load()`.
-    tqm = TaskQueueManager(
-        inventory=inventory,
-        variable_manager=variable_manager,
-        loader=loader,
-        passwords=passwords,
-        stdout_callback=results_callback,  # Use our custom callback instead of the ``default`` callback plugin, which prints to stdout
-    )
-
-    # create data structure that represents our play, including tasks, this is basically what our YAML loader does internally.
-    play_source = dict(
-        name="Ansible Play",
-        hosts=host_list,
-        gather_facts='no',
-        tasks=[
-            dict(action=dict(module='shell', args="du -sh /var/lib/docker/volumes/nova_compute/_data/instances/* /var/lib/nova/instances/* 2> /dev/null | grep -vE 'base|locks|nodes|snapshots' | awk '{print $2, $1}' | awk -F 'instances/' '{print$2}'"), register='disk_out'),
+        marker = len(stdout_lines)
+    record = _parse_health(stdout_lines[marker + 1:])
+    record['vms'] = _parse_disk_usage(stdout_lines[:marker])
+    return record
+
+
+def resolve_forks(forks, host_count):
+    """Returns the number of forks used to probe host_count hosts.
+
+    forks is either a fixed number or 'auto', which scales the forks with the
+    number of hosts within the local CPU and open file limits.
+    """
+    if forks != 'auto':
+        return int(forks or DEFAULT_FORKS)
+    # Forks mostly wait on SSH, so each CPU can drive plenty of them
+    cpu_limit = (os.cpu_count() or 1) * 16
+    # Every fork keeps an SSH connection and a few pipes open
+    soft_nofile, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+    fd_limit = max(1, (soft_nofile - 64) // 8)
+    return max(1, min(host_count, cpu_limit, fd_limit, MAX_FORKS))
+
+
+class SweepResult(dict):
+    """Results of a probe keyed by host, for the hosts that answered in time.
+
+    The hosts without a result are listed with the reason in the unreachable,
+    failed and timed_out dictionaries.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(SweepResult, self).__init__(*args, **kwargs)
+        self.unreachable = {}
+        self.failed = {}
+        self.timed_out = {}
+
+    def copy_status(self, other):
+        self.unreachable.update(other.unreachable)
+        self.failed.update(other.failed)
+        self.timed_out.update(other.timed_out)
+
+    def summary(self):
+        # One line description of the hosts left out of the sweep, if any
+        missing = [(name, hosts) for name, hosts in [('timed out', self.timed_out),
+                                                    ('unreachable', self.unreachable),
+                                                    ('failed', self.failed)] if hosts]
+        if not missing:
+            return None
+        return '; '.join(f"{len(hosts)} {name}: {', '.join(sorted(hosts))}" for name, hosts in missing)
+
+
+def unreachable_hosts(host_list, timeout=PRECHECK_TIMEOUT, port=SSH_PORT):
+    """Returns the hosts not accepting TCP connections on the port, with the reason."""
+    def check(host):
+        try:
+            with socket.create_connection((host, port), timeout=timeout):
+                return None
+        except OSError as e:
+            return f"port {port} not reachable: {e}"
+
+    if len(host_list) == 0:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(len(host_list), PRECHECK_WORKERS)) as executor:
+        results = executor.map(check, host_list)
+    return {host: reason for host, reason in zip(host_list, results) if reason is not None}
+
+
+class ProbeExecutor:
+    """Runs probe plays on batches of hosts with one long-lived Ansible setup.
+
+    The Ansible CLI options, loader, inventory and variable manager are set up
+    once and reused by every batch until close() is called. The Ansible
+    workers are forked for every play, which is only reliable from the main
+    thread, so the probes must be run from the main thread.
+
+    Every task is killed after host_timeout seconds on a host. Once deadline
+    seconds have passed no new host of a batch is started, so the batch ends
+    at the latest host_timeout seconds after the deadline. With slice_size,
+    the hosts of a batch are run that many at a time, with the progress
+    reported on stderr after each slice. With ssh_persist,
+    the SSH connection to every host is kept open for that many seconds after
+    a batch and reused by the following batches, even from other processes,
+    and modules are piped over it instead of copied. With precheck, hosts not
+    accepting a connection on the SSH port within that many seconds are
+    reported and left out of the play instead of holding a fork.
+    """
+
+    def __init__(self, forks=DEFAULT_FORKS, host_timeout=None, deadline=None, ssh_persist=None, precheck=None,
+                 slice_size=None):
+        self.forks = forks
+        # A task started just before the deadline should not run for much longer than it
+        self.host_timeout = host_timeout or deadline
+        self.deadline = deadline
+        self.ssh_persist = ssh_persist
+        self.precheck = precheck
+        self.slice_size = slice_size
+        self._closed = False
+        # since the API is constructed for CLI it expects certain options to always be set in the context object
+        context.CLIARGS = ImmutableDict(connection='smart', module_path=['/to/mymodules', '/usr/share/ansible'], forks=resolve_forks(forks, 1), become='yes',
+                                        become_method='sudo', become_flags='-i', become_user=None, check=False, diff=False, verbosity=0)
+        # initialize needed objects
+        self._loader = DataLoader()  # Takes care of finding and reading yaml, json and ini files
+        self._passwords = dict(vault_pass='secret')
+        # create an empty inventory, the hosts of every batch are added to it
+        self._inventory = InventoryManager(loader=self._loader)
+        # variable manager takes care of merging all the different sources to give you a unified view of variables available in each context
+        self._variable_manager = VariableManager(loader=self._loader, inventory=self._inventory)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _add_hosts(self, host_list, host_vars):
+        new_hosts = [host for host in host_list if host not in self._inventory.hosts]
+        for host in new_hosts:
+            self._inventory.add_host(host, group='all')
+        if len(new_hosts) > 0:
+            # Host patterns resolved by earlier batches do not know the new hosts
+            self._inventory.clear_pattern_cache()
+        for host in host_list:
+            for name, value in host_vars.get(host, {}).items():
+                self._inventory.get_host(host).set_variable(name, value)
+
+    def run(self, host_list, tasks, parse=None, consumer=None, host_vars=None, keep_results=True):
+        """Runs the tasks on every host and returns a SweepResult of the parsed output.
+
+        The output of each host is parsed with parse and handed to consumer as
+        soon as the host answers. host_vars maps hosts to the variables the
+        tasks are templated with on them. Without keep_results the records are
+        only handed to consumer and the result only lists the hosts without
+        one, so memory does not grow with the number of hosts.
+        """
+        host_vars = host_vars or {}
+        sweep_result = SweepResult()
+        slice_size = self.slice_size or max(len(host_list), 1)
+        ends_at = time.monotonic() + self.deadline if self.deadline else None
+        for start in range(0, len(host_list), slice_size):
+            deadline = None
+            if ends_at is not None:
+                deadline = ends_at - time.monotonic()
+                if deadline <= 0:
+                    sweep_result.timed_out.update({host: 'deadline reached' for host in host_list[start:]})
+                    break
+            slice_hosts = host_list[start:start + slice_size]
+            slice_vars = {host: host_vars[host] for host in slice_hosts if host in host_vars}
+            slice_result = self._run_slice(slice_hosts, tasks, parse, consumer, slice_vars, deadline)
+            if keep_results:
+                sweep_result.update(slice_result)
+            sweep_result.copy_status(slice_result)
+            if self.slice_size:
+                done = min(start + slice_size, len(host_list))
+                # Writing to stderr so the JSON output stays valid
+                print(f"Probed {done}/{len(host_list)} hosts - {sweep_result.summary() or 'all answered'}",
+                      file=sys.stderr)
+                # Releasing the Ansible objects of the slice before starting the next one
+                del slice_result
+                gc.collect()
+        return sweep_result
+
+    def _run_slice(self, host_list, tasks, parse, consumer, host_vars, deadline):
+        if not self.precheck:
+            return self._run_play(host_list, tasks, parse, consumer, host_vars, deadline)
+
+        unreachable = unreachable_hosts(host_list, self.precheck)
+        if len(unreachable) > 0:
+            # Writing to stderr so the JSON output stays valid
+            print(f"Skipping {len(unreachable)} unreachable hosts: {', '.join(sorted(unreachable))}",
+                  file=sys.stderr)
+        reachable = [host for host in host_list if host not in unreachable]
+        if len(reachable) > 0:
+            sweep_result = self._run_play(reachable, tasks, parse, consumer, host_vars, deadline)
+        else:
+            sweep_result = SweepResult()
+        sweep_result.unreachable.update(unreachable)
+        return sweep_result
+
+    @_main_thread_only
+    def _run_play(self, host_list, tasks, parse, consumer, host_vars, deadline):
+        if self._closed:
+            raise RuntimeError('The probe executor is closed')
+        forks = resolve_forks(self.forks, len(host_list))
+        self._add_hosts(host_list, host_vars)
+
+        # Instantiate our ResultsCollectorJSONCallback for handling results as they come in. Ansible expects this to be one of its main display outlets
+        results_callback = ResultsCollectorJSONCallback(parse=parse, consumer=consumer)
+
+        # instantiate task queue manager, which takes care of forking and setting up all objects to iterate over host list and tasks
+        # IMPORTANT: This also adds library dirs paths to the module loader
+        # IMPORTANT: and so it must be initialized before calling `Play.load()`.
+        tqm = TaskQueueManager(
+            inventory=self._inventory,
+            variable_manager=self._variable_manager,
+            loader=self._loader,
+            passwords=self._passwords,
+            stdout_callback=results_callback,  # Use our custom callback instead of the ``default`` callback plugin, which prints to stdout
+            forks=forks,  # the task queue manager does not read the forks from the context object
+        )
+
+        if self.host_timeout:
+            tasks = [dict(task, timeout=self.host_timeout) for task in tasks]
+
+        # create data structure that represents our play, including tasks, this is basically what our YAML loader does internally.
+        play_source = dict(
+            name="Ansible Play",
+            hosts=host_list,
+            gather_facts='no',
+            tasks=tasks
+        )
+        if self.ssh_persist:
+            # Pipelining with become needs requiretty to be disabled in the sudoers of the hosts
+            play_source['vars'] = dict(
+                ansible_connection='ssh',
+                ansible_ssh_args=f"-C -o ControlMaster=auto -o ControlPersist={self.ssh_persist}s",
+                ansible_control_path_dir=CONTROL_PATH_DIR,
+                ansible_pipelining=True,
+            )
+
+        # Create play object, playbook objects use .load instead of init or new methods,
+        # this will also automatically create the task objects from the info provided in play_source
+        play = Play().load(play_source, variable_manager=self._variable_manager, loader=self._loader)
+
+        # Stop handing hosts to the workers once the deadline has passed
+        deadline_timer = None
+        if deadline:
+            deadline_timer = threading.Timer(deadline, tqm.terminate)
+            deadline_timer.daemon = True
+            deadline_timer.start()
+
+        # Actually run it
+        try:
+            tqm.run(play)  # most interesting data for a play is actually sent to the callback's methods
+        finally:
+            if deadline_timer:
+                deadline_timer.cancel()
+            # we always need to cleanup child procs and the structures we use to communicate with them
+            tqm.cleanup()
+            self._loader.cleanup_all_tmp_files()
+
+        return _sweep_result(host_list, results_callback, deadline)
+
+    def vm_disk_usage_by_host(self, hvs, consumer=None, backend=DEFAULT_USAGE_BACKEND, targets=None,
+                              keep_results=True):
+        """Probes the disk usage of the VMs on every host.
+
+        With targets, a dictionary of host and VM UUIDs, only the hosts in it
+        are probed and only the instance directories of the listed VMs sized.
+        """
+        host_vars = None
+        if targets is not None:
+            hvs = [hv for hv, uuids in targets.items() if len(uuids) > 0]
+            host_vars = {hv: {TARGETS_VAR: sorted(targets[hv])} for hv in hvs}
+        tasks = [
+            _shell_task(disk_usage_command(backend, targeted=targets is not None)),
             # dict(action=dict(module='shell', args="for i in $(/bin/virsh list --all --uuid); do echo $i ; du -sh /var/lib/nova/instances/$i | awk '{print $1}'; done"), register='disk_out'),
-            # dict(action=dict(module='shell', args="du -sh /var/lib/docker/volumes/nova_compute/_data/instances/* | grep -vE 'base|locks|nodes|snapshots' | awk '{print $2, $1}'"), register='disk_out')
+            # dict(action=dict(module='shell', args="du -sk /var/lib/docker/volumes/nova_compute/_data/instances/* | grep -vE 'base|locks|nodes|snapshots' | awk '{print $2, $1}'"), register='disk_out')
         ]
-    )
-
-    # Create play object, playbook objects use .load instead of init or new methods,
-    # this will also automatically create the task objects from the info provided in play_source
-    play = Play().load(play_source, variable_manager=variable_manager, loader=loader)
-
-    # Actually run it
-    try:
-        result = tqm.run(play)  # most interesting data for a play is actually sent to the callback's methods
-    finally:
-        # we always need to cleanup child procs and the structures we use to communicate with them
-        tqm.cleanup()
-        if loader:
-            loader.cleanup_all_tmp_files()
-
-    # Remove ansible tmpdir
-    shutil.rmtree(C.DEFAULT_LOCAL_TMP, True)
-    disk_usage_list = []
-    for host, result in results_callback.host_ok.items():
-        disk_usage_list += (result._result['stdout_lines'])
-        # Returning a dictionary of VM UUID and disk usage key value pair from list result
-    if any('/var/lib/docker/volumes/nova_compute/_data/instances/' in str for str in disk_usage_list ):   
-        disk_usage_list = [item.replace("/var/lib/docker/volumes/nova_compute/_data/instances/", "") for item in disk_usage_list]
-    else:
-        disk_usage_list = [item.replace("/var/lib/nova/instances/", "") for item in disk_usage_list]
-    disk_usage_list = [str.split(' ') for str in disk_usage_list ]
-    new_list = []
-    for lst in disk_usage_list:
-        new_list += lst
-    disk_usage_list = new_list
-    return (dict(zip(disk_usage_list[::2], disk_usage_list[1::2])))
-
-def high_risk_hv(hvs):
-    if isinstance(hvs, list):
-        host_list = hvs
-    else:
-        host_list = [hvs]
-    # since the API is constructed for CLI it expects certain options to always be set in the context object
-    context.CLIARGS = ImmutableDict(connection='smart', module_path=['/to/mymodules', '/usr/share/ansible'], forks=10, become='yes',
-                                    become_method='sudo', become_flags='-i', become_user=None, check=False, diff=False, verbosity=0)
-    # required for
-    # https://github.com/ansible/ansible/blob/devel/lib/ansible/inventory/manager.py#L204
-    sources = ','.join(host_list)
-    if len(host_list) == 1:
-        sources += ','
-
-    # initialize needed objects
-    loader = DataLoader()  # Takes care of finding and reading yaml, json and ini files
-    passwords = dict(vault_pass='secret')
-
-    # Instantiate our ResultsCollectorJSONCallback for handling results as they come in. Ansible expects this to be one of its main display outlets
-    results_callback = ResultsCollectorJSONCallback()
-
-    # create inventory, use path to host config file as source or hosts in a comma separated string
-    inventory = InventoryManager(loader=loader, sources=sources)
-
-    # variable manager takes care of merging all the different sources to give you a unified view of variables available in each context
-    variable_manager = VariableManager(loader=loader, inventory=inventory)
-
-    # instantiate task queue manager, which takes care of forking and setting up all objects to iterate over host list and tasks
-    # IMPORTANT: This also adds library dirs paths to the module loader
-    # IMPORTANT: and so it must be initialized before calling `Play.load()`.
-    tqm = TaskQueueManager(
-        inventory=inventory,
-        variable_manager=variable_manager,
-        loader=loader,
-        passwords=passwords,
-        stdout_callback=results_callback,  # Use our custom callback instead of the ``default`` callback plugin, which prints to stdout
-    )
-
-    # create data structure that represents our play, including tasks, this is basically what our YAML loader does internally.
-    play_source = dict(
-        name="Ansible Play",
-        hosts=host_list,
-        gather_facts='no',
-        tasks=[
-            dict(action=dict(module='shell', args="df -h | awk '/mapper/ {print $5}' && free | awk '/Mem/ {print $3/$2 * 100}' && /opt/MegaRAID/MegaCli/MegaCli -AdpAlILog -aAll | grep Punc | wc -l"), register='disk_out'),
+        # Returning a dictionary of VM UUID and disk usage in bytes per host that answered
+        return self.run(_host_list(hvs), tasks, _parse_disk_usage, consumer, host_vars, keep_results)
+
+    def high_risk_hv(self, hvs, consumer=None):
+        tasks = [
+            _shell_task(HEALTH_COMMAND),
         ]
-    )
-
-    # Create play object, playbook objects use .load instead of init or new methods,
-    # this will also automatically create the task objects from the info provided in play_source
-    play = Play().load(play_source, variable_manager=variable_manager, loader=loader)
-
-    # Actually run it
-    try:
-        result = tqm.run(play)  # most interesting data for a play is actually sent to the callback's methods
-    finally:
-        # we always need to cleanup child procs and the structures we use to communicate with them
-        tqm.cleanup()
-        if loader:
-            loader.cleanup_all_tmp_files()
-
-    # Remove ansible tmpdir
-    shutil.rmtree(C.DEFAULT_LOCAL_TMP, True)
-    result_list = {}
-    for host, result in results_callback.host_ok.items():
-        result_list[host] = {
-        'disk_usage': result._result['stdout_lines'][0].replace('%', ''),
-        'ram_usage': result._result['stdout_lines'][1], 
-        'raid_punctures': result._result['stdout_lines'][2]}
-    return result_list
\ No newline at end of file
+        return self.run(_host_list(hvs), tasks, _parse_health, consumer)
+
+    def hypervisor_probe(self, hvs, consumer=None, backend=DEFAULT_USAGE_BACKEND):
+        """Collects the VM disk usage and the health of each hypervisor in one SSH round.
+
+        Every host record holds the disk_usage, ram_usage and raid_punctures of
+        high_risk_hv and the disk usage in bytes of its VMs under 'vms'.
+        """
+        tasks = [
+            _shell_task(f"{disk_usage_command(backend)}; echo '{HEALTH_MARKER}'; {HEALTH_COMMAND}"),
+        ]
+        return self.run(_host_list(hvs), tasks, _parse_hypervisor, consumer)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._loader.cleanup_all_tmp_files()
+        # Remove ansible tmpdir
+        shutil.rmtree(C.DEFAULT_LOCAL_TMP, True)
+
+
+def _shell_task(command):
+    # A string of args is split into k=v module parameters, which breaks commands like the stat backend's awk +=
+    return dict(action=dict(module='shell', args=dict(_raw_params=command)), register='disk_out')
+
+
+def _host_list(hvs):
+    if isinstance(hvs, list):
+        return hvs
+    return [hvs]
+
+
+def _sweep_result(host_list, results_callback, deadline=None):
+    sweep_result = SweepResult(results_callback.host_ok)
+    sweep_result.unreachable.update(results_callback.host_unreachable)
+    for host, message in results_callback.host_failed.items():
+        # Ansible kills tasks running longer than their timeout and reports them as failed
+        if 'expected time frame' in message:
+            sweep_result.timed_out[host] = message
+        else:
+            sweep_result.failed[host] = message
+    for host in host_list:
+        if host not in sweep_result and host not in sweep_result.unreachable \
+                and host not in sweep_result.failed and host not in sweep_result.timed_out:
+            if deadline:
+                # Hosts that were never started because the deadline passed
+                sweep_result.timed_out[host] = 'deadline reached'
+            else:
+                sweep_result.failed[host] = 'no result'
+    return sweep_result